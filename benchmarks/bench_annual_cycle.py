@@ -0,0 +1,181 @@
+"""
+Benchmarks of the phases of the annual cycle and of a full simulated year.
+
+Run from the repository root, e.g.
+
+    python -m benchmarks.bench_annual_cycle --output results.json
+    python -m benchmarks.bench_annual_cycle --compare results.json --threshold 0.2
+
+Every case is run on a square island of size x size lowland cells, surrounded by water, with density herbivores and
+density // 10 carnivores per cell. The result of a case is the fastest of repeat runs, in seconds. With --compare the
+exit status is 1 if any case is slower than in the given results by more than the threshold.
+"""
+import argparse
+import json
+import platform
+import subprocess
+import sys
+import timeit
+import numpy as np
+
+from src.biosim.biosim import BioSim
+from src.biosim.land import Island
+
+sizes = (3, 10, 50, 200)
+densities = (10, 100, 1000, 10000, 100000)
+phases = ('feeding', 'procreation', 'aging', 'migration')
+
+
+def island_map(size: int) -> str:
+    """
+    The Island_map function returns a square lowland island surrounded by water.
+    param size: int, number of habitable cells along each side
+    :return: str
+    """
+    water = 'W' * (size + 2)
+    return '\n'.join([water] + ['W' + 'L' * size + 'W'] * size + [water])
+
+
+def populated_island(size: int, density: int) -> Island:
+    """
+    The Populated_island function creates an Island with density herbivores and density // 10 carnivores per cell.
+    The random number streams of the cells are created here, so a timed phase does not pay for them.
+    param size: int
+    param density: int
+    :return: Island
+    """
+    island = Island({(x_ax, y_ax): 'L' for x_ax in range(2, size + 2) for y_ax in range(2, size + 2)})
+    create_streams(island)
+    for cell in island.cells:
+        for cell_pop, count in ((cell.herb_pop, density), (cell.carn_pop, density // 10)):
+            if count:
+                cell_pop.append(np.full(count, 5), np.full(count, 20.0))
+    return island
+
+
+def create_streams(island):
+    """
+    The Create_streams function creates the random number streams of every cell of a serial Island, which are
+    otherwise only created when a cell first draws. Other islands create their streams up front.
+    param island: Island or VectorizedIsland
+    :return:
+    """
+    for cell in getattr(island, 'cells', ()):
+        cell.streams
+
+
+def run_phase(island: Island, phase: str):
+    """
+    The Run_phase function runs one phase of the annual cycle on every cell of the island.
+    param island: Island
+    param phase: str
+    :return:
+    """
+    for cell in island.cells:
+        getattr(cell, phase)()
+    if phase == 'migration':
+        for cell in island.cells:
+            cell.settle_migrants()
+
+
+def time_case(size: int, density: int, case: str, repeat: int, engine='serial') -> float:
+    """
+    The Time_case function times a phase or a full year ('year') on a freshly populated island. Building the island,
+    including its random number streams, is not timed.
+    param size: int
+    param density: int
+    param case: str, one of phases or 'year'
+    param repeat: int
+    param engine: str, the BioSim engine of the 'year' case
+    :return: float, the fastest time in seconds
+    """
+    state = {}
+
+    def setup():
+        if case == 'year':
+            pop = [{'species': 'Herbivore', 'age': 5, 'weight': 20}] * density + \
+                  [{'species': 'Carnivore', 'age': 5, 'weight': 20}] * (density // 10)
+            ini_pop = [{'loc': (x_ax, y_ax), 'pop': pop} for x_ax in range(2, size + 2) for y_ax in range(2, size + 2)]
+            state['sim'] = BioSim(island_map(size), ini_pop=ini_pop, vis_years=0, engine=engine, quiet=True)
+            create_streams(state['sim'].island)
+        else:
+            state['island'] = populated_island(size, density)
+
+    def stmt():
+        if case == 'year':
+            state['sim'].simulate(1)
+        else:
+            run_phase(state['island'], case)
+
+    timer = timeit.Timer(stmt=stmt, setup=setup)
+    return min(timer.repeat(repeat=repeat, number=1))
+
+
+def run(sizes=sizes, densities=densities, cases=phases + ('year',), repeat=3, max_animals=10 ** 6,
+        engine='serial') -> dict:
+    """
+    The Run function times every case on the grid of island sizes and densities. Combinations with more than
+    max_animals herbivores are skipped.
+    :return: dict with the meta data of the run and the results by case name
+    """
+    results = {}
+    for size in sizes:
+        for density in densities:
+            if size * size * density > max_animals:
+                continue
+            for case in cases:
+                name = '{}/{}x{}/{}'.format(case, size, size, density)
+                results[name] = time_case(size, density, case, repeat, engine)
+                print('{:<30} {:10.4f} s'.format(name, results[name]), file=sys.stderr)
+    try:
+        commit = subprocess.run(['git', 'rev-parse', 'HEAD'], capture_output=True, text=True).stdout.strip()
+    except OSError:
+        commit = None
+    meta = {'commit': commit, 'python': platform.python_version(), 'numpy': np.__version__,
+            'machine': platform.machine(), 'engine': engine, 'repeat': repeat}
+    return {'meta': meta, 'results': results}
+
+
+def compare(results: dict, baseline: dict, threshold=0.2) -> list:
+    """
+    The Compare function finds the cases that are slower than in a baseline by more than the threshold.
+    param results: dict made by run
+    param baseline: dict made by run
+    param threshold: float, allowed relative slow down
+    :return: list of (case, baseline seconds, seconds) of the regressions
+    """
+    return [(name, baseline['results'][name], seconds) for name, seconds in results['results'].items()
+            if name in baseline['results'] and seconds > baseline['results'][name] * (1 + threshold)]
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', type=int, nargs='+', default=sizes)
+    parser.add_argument('--densities', type=int, nargs='+', default=densities)
+    parser.add_argument('--cases', nargs='+', default=phases + ('year',), choices=phases + ('year',))
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--max-animals', type=int, default=10 ** 6)
+    parser.add_argument('--engine', default='serial', choices=('serial', 'vectorized'))
+    parser.add_argument('--output', help='write the results as JSON to this file')
+    parser.add_argument('--compare', help='JSON results to compare with')
+    parser.add_argument('--threshold', type=float, default=0.2)
+    args = parser.parse_args(argv)
+
+    results = run(args.sizes, args.densities, tuple(args.cases), args.repeat, args.max_animals, args.engine)
+    if args.output:
+        with open(args.output, 'w') as output:
+            json.dump(results, output, indent=2)
+    else:
+        print(json.dumps(results, indent=2))
+
+    if args.compare:
+        with open(args.compare) as baseline_file:
+            regressions = compare(results, json.load(baseline_file), args.threshold)
+        for name, before, after in regressions:
+            print('Regression {}: {:.4f} s -> {:.4f} s'.format(name, before, after), file=sys.stderr)
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,12 +1,102 @@
 import math
 import random
+from typing import NamedTuple
+import numpy as np
+
+# Compiled parameter blocks per species, keyed by the class, with the parameter dict and the stamp they were built
+# from, see Animal.compiled_params.
+_param_blocks = {}
+
+
+class ParamDict(dict):
+    """
+    The ParamDict class is the parameter dict of a species. It counts its changes in version, so compiled_params can
+    tell whether its block is current without comparing every value.
+    """
+    version = 0
+
+    def __setitem__(self, key, value):
+        super().__setitem__(key, value)
+        self.version += 1
+
+    def __delitem__(self, key):
+        super().__delitem__(key)
+        self.version += 1
+
+    def __ior__(self, other):
+        self.update(other)
+        return self
+
+    def update(self, *args, **kwargs):
+        super().update(*args, **kwargs)
+        self.version += 1
+
+    def pop(self, *args):
+        self.version += 1
+        return super().pop(*args)
+
+    def popitem(self):
+        self.version += 1
+        return super().popitem()
+
+    def setdefault(self, key, default=None):
+        self.version += 1
+        return super().setdefault(key, default)
+
+    def clear(self):
+        super().clear()
+        self.version += 1
+
+
+class ParamBlock(NamedTuple):
+    """
+    The ParamBlock class holds the parameters of a species as plain floats, together with constants derived from
+    them, for the batch kernels. It is immutable and only rebuilt when the parameters change, see
+    Animal.compiled_params. A parameter that is None, like DeltaPhiMax of herbivores, is stored as nan.
+    """
+    w_birth: float
+    sigma_birth: float
+    beta: float
+    eta: float
+    a_half: float
+    w_half: float
+    phi_age: float
+    phi_weight: float
+    mu: float
+    gamma: float
+    zeta: float
+    xi: float
+    omega: float
+    F: float
+    DeltaPhiMax: float
+    # Factor of the weight kept in aging, 1 - eta.
+    survival: float
+    # Least weight to give birth, zeta * (w_birth + sigma_birth).
+    min_birth_weight: float
+    # Read-only age factor 1 / (1 + e ** (phi_age * (age - a_half))) of the fitness, indexed by integer age.
+    age_table: np.ndarray
+
+
+def compile_params(params: dict, table_size=128) -> ParamBlock:
+    """
+    The Compile_params function converts a parameter dict into a ParamBlock.
+    param params: dict with the keys of Animal.params
+    param table_size: int, number of ages covered by the age table
+    :return: ParamBlock
+    """
+    values = {name: math.nan if params[name] is None else float(params[name]) for name in Animal.params}
+    with np.errstate(over='ignore'):
+        age_table = 1 / (1 + np.exp(values['phi_age'] * (np.arange(table_size) - values['a_half'])))
+    age_table.flags.writeable = False
+    return ParamBlock(survival=1 - values['eta'],
+                      min_birth_weight=values['zeta'] * (values['w_birth'] + values['sigma_birth']),
+                      age_table=age_table, **values)
 
 
 class Animal:
     """
     The Animal Class defines basic characteristic functions of herbivores and carnivores.
     """
-    random.seed(1)
     params = {
         'w_birth': 0.0,
         'sigma_birth': 0.0,
@@ -25,22 +115,53 @@ class Animal:
         'DeltaPhiMax': 0.0
     }
 
+    def __init_subclass__(cls, **kwargs):
+        """
+        The Init_subclass function turns the params of every species into a ParamDict.
+        """
+        super().__init_subclass__(**kwargs)
+        if 'params' in cls.__dict__:
+            cls.params = ParamDict(cls.params)
+
     def __init__(self, animal: dict):
         """
         Initialization function to define age and weight of animal.
         param animal: dict
         """
         # self.species = animal['species']
-        self.phi: float = animal['fitness']
+        self._phi = animal['fitness']
+        self._phi_valid = False
         if animal['age'] < 0.0:
             raise ValueError('Age of an animal cannot be negative. Please enter age greater than 0.')
         else:
-            self.age: float = animal['age']
+            self._age: float = animal['age']
         if animal['weight'] < 0.0:
             raise ValueError('Weight of an animal cannot be zero or negative. Please enter weight of positive real '
                              'number')
         else:
-            self.weight: float = animal['weight']
+            self._weight: float = animal['weight']
+
+    @property
+    def age(self) -> float:
+        return self._age
+
+    @age.setter
+    def age(self, value: float):
+        self._age = value
+        self._phi_valid = False
+
+    @property
+    def weight(self) -> float:
+        return self._weight
+
+    @weight.setter
+    def weight(self, value: float):
+        self._weight = value
+        self._phi_valid = False
+
+    @property
+    def phi(self) -> float:
+        return self.fitness()
 
     def aging(self):
         """
@@ -54,19 +175,91 @@ class Animal:
         The weight_loss function reduces weight of animal by eta * self_weight.
         :return: float
         """
-        self.weight -= self.params['eta'] * self.weight
+        self.weight -= self.compiled_params().eta * self.weight
 
     def fitness(self) -> float:
         """
-        The fitness function calculates the phi value of animal which represents its fitness.
+        The fitness function calculates the phi value of animal which represents its fitness. The value is cached
+        and only recalculated after the age or weight of the animal changes.
         :return: float
         """
+        if self._phi_valid:
+            return self._phi
+        params = self.compiled_params()
         if self.weight <= 0:
-            self.phi = 0
+            self._phi = 0
         else:
-            self.phi = (1 / (1 + math.e ** (self.params['phi_age'] * (self.age - self.params['a_half'])))) * \
-                       (1 / (1 + math.e ** (- self.params['phi_weight'] * (self.weight - self.params['w_half']))))
-        return self.phi
+            self._phi = (1 / (1 + math.e ** (params.phi_age * (self.age - params.a_half)))) * \
+                        (1 / (1 + math.e ** (- params.phi_weight * (self.weight - params.w_half))))
+        self._phi_valid = True
+        return self._phi
+
+    @classmethod
+    def set_params(cls, params: dict):
+        """
+        The Set_params function checks and updates parameters of the species. Every value must be a non-negative
+        number, eta at most 1 and DeltaPhiMax positive. Nothing is changed if any value is invalid.
+        param params: dict mapping parameter name to value
+        :return:
+        """
+        for name, value in params.items():
+            if name not in cls.params:
+                raise ValueError('Unknown parameter {} of {}.'.format(name, cls.__name__))
+            if isinstance(value, bool) or not isinstance(value, (int, float)) or not 0 <= value < math.inf:
+                raise ValueError('Parameter {} must be a non-negative number, not {}.'.format(name, value))
+        if params.get('eta', 0) > 1:
+            raise ValueError('Parameter eta must be at most 1.')
+        if params.get('DeltaPhiMax', 1) <= 0:
+            raise ValueError('Parameter DeltaPhiMax must be positive.')
+        cls.params.update(params)
+
+    @classmethod
+    def compiled_params(cls, max_age=0) -> ParamBlock:
+        """
+        The Compiled_params function returns the ParamBlock of the species, with an age table covering at least
+        max_age. The block is built once and only rebuilt when the parameters change or a larger age is needed.
+        Changes are found through the version of the ParamDict, which set_params and direct edits count up. If params
+        was replaced by a plain dict, the values themselves are compared instead.
+        param max_age: int
+        :return: ParamBlock
+        """
+        params = cls.params
+        stamp = params.version if isinstance(params, ParamDict) else tuple(params.values())
+        built_params, built_stamp, block = _param_blocks.get(cls, (None, None, None))
+        current = built_params is params and built_stamp == stamp
+        if not current or len(block.age_table) <= max_age:
+            size = len(block.age_table) if current else 128
+            while size <= max_age:
+                size *= 2
+            block = compile_params(params, size)
+            _param_blocks[cls] = (params, stamp, block)
+        return block
+
+    @classmethod
+    def age_table(cls, max_age: int) -> np.ndarray:
+        """
+        The Age_table function returns the age factor 1 / (1 + e ** (phi_age * (age - a_half))) of the fitness for
+        every integer age from 0 up to at least max_age, see compiled_params.
+        param max_age: int
+        :return: read-only numpy array indexed by age
+        """
+        return cls.compiled_params(max_age).age_table
+
+    @classmethod
+    def fitness_batch(cls, age: np.ndarray, weight: np.ndarray) -> np.ndarray:
+        """
+        The Fitness_batch function calculates phi for many animals of the species at once.
+        param age: numpy array of int
+        param weight: numpy array of float
+        :return: numpy array of float
+        """
+        if len(age) == 0:
+            return np.zeros(0)
+        params = cls.compiled_params(int(age.max()))
+        age_factor = params.age_table[age]
+        with np.errstate(over='ignore'):
+            weight_factor = 1 / (1 + np.exp(- params.phi_weight * (weight - params.w_half)))
+        return np.where(weight <= 0, 0.0, age_factor * weight_factor)
 
     def get_dict(self) -> dict:
         return {'age': self.age,
@@ -83,7 +276,7 @@ class Animal:
         if self.weight <= 0:
             return True
 
-        if random.random() < self.params['omega'] * (1 - self.phi):
+        if random.random() < self.compiled_params().omega * (1 - self.phi):
             return True
         else:
             return False
@@ -94,14 +287,14 @@ class Animal:
         param: no_of_animals
         :return: bool, float
         """
+        params = self.compiled_params()
         is_birth: bool = False
-        child_weight = random.gauss(self.params['w_birth'], self.params['sigma_birth'])
-        min_weight = self.params['zeta'] * (self.params['w_birth'] + self.params['sigma_birth'])
-        after_birth_weight = self.weight - self.params['xi'] * child_weight
+        child_weight = random.gauss(params.w_birth, params.sigma_birth)
+        after_birth_weight = self.weight - params.xi * child_weight
 
-        if self.weight < child_weight or self.weight < min_weight or self.weight < after_birth_weight:
+        if self.weight < child_weight or self.weight < params.min_birth_weight or self.weight < after_birth_weight:
             is_birth = False
-        elif random.random() < min(1, self.params['gamma'] * self.phi * (no_of_animals - 1)):
+        elif random.random() < min(1, params.gamma * self.phi * (no_of_animals - 1)):
             is_birth = True
             self.weight = after_birth_weight
 
@@ -113,19 +306,19 @@ class Animal:
         :return: bool
         """
         self.fitness()
-        if random.random() > self.params['mu'] * self.phi:
+        if random.random() < self.compiled_params().mu * self.phi:
             return True
         else:
             return False
 
     def migrate_loc(self, location: tuple) -> tuple:
         """
-        The Migrate_loc function provides randomly chosen coordinates.
+        The Migrate_loc function provides randomly chosen coordinates of a cell north, south, east or west of location.
         param location: tuple
         :return: tuple
         """
-        return random.choice([(location[0] + 1, location[1] + 1), (location[0] - 1, location[1] - 1),
-                              (location[0] + 1, location[1] - 1), (location[0] - 1, location[1] + 1)])
+        return random.choice([(location[0], location[1] - 1), (location[0], location[1] + 1),
+                              (location[0] + 1, location[1]), (location[0] - 1, location[1])])
 
 
 class Herbivore(Animal):
@@ -163,8 +356,9 @@ class Herbivore(Animal):
         param fodder: float
         :return: float
         """
-        food = self.params['F'] if self.params['F'] < fodder else fodder
-        self.weight += food * self.params['beta']
+        params = self.compiled_params()
+        food = params.F if params.F < fodder else fodder
+        self.weight += food * params.beta
         return food, self.weight, self.fitness()
 
 
@@ -187,23 +381,6 @@ class Carnivore(Animal):
         'DeltaPhiMax': 10.0
     }
 
-    def __init__(self, animal: dict):
-        """
-        The Initialize function creates a herbivore with age and weight
-        param animal: dict
-        """
-        super().__init__(animal)
-        self.max_food = self.params['F']
-
-    def eat(self, preys: list):
-
-        for idx, prey in enumerate(preys):
-            food = prey['weight'] if self.max_food > prey['weight'] else self.max_food
-            self.weight += self.params['beta'] * food
-            self.max_food -= food
-            if self.max_food == 0:
-                preys = preys[(idx + 1):]
-                break
-
-        return preys
 
+# Animal class for every species name.
+animal_species = {'Herbivore': Herbivore, 'Carnivore': Carnivore}
@@ -1,6 +1,30 @@
 import textwrap
-from src.biosim.land import Island
-import timeit
+from src.biosim.animals import animal_species
+from src.biosim.checkpoint import read_checkpoint, write_checkpoint
+from src.biosim.land import Island, habitable_cells, landscapes, parse_map
+from src.biosim.logger import YearLog
+from src.biosim.parallel import TiledIsland
+from src.biosim.profiling import PhaseStats
+from src.biosim.statistics import PopulationStatistics
+from src.biosim.vectorized import VectorizedIsland
+from src.biosim.visualize import FrameRenderer, Visualize
+
+
+def _set_landscape_class_params(landscape, params):
+    """
+    Check the parameters of a landscape and set them on its class, whose values new islands and checkpoints use.
+    :param landscape: String, code letter for landscape
+    :param params: Dict with valid parameter specification for landscape
+    """
+    if landscape not in landscapes:
+        raise ValueError('Unknown landscape {}. Please choose one of {}.'.format(landscape, ', '.join(landscapes)))
+    for name, value in params.items():
+        if name != 'f_max':
+            raise ValueError('Unknown landscape parameter {}. Only f_max can be set.'.format(name))
+        if isinstance(value, bool) or not isinstance(value, (int, float)) or value < 0:
+            raise ValueError('f_max must be a non-negative number, not {}.'.format(value))
+    if 'f_max' in params:
+        landscapes[landscape].f_max = float(params['f_max'])
 
 
 class BioSim:
@@ -8,7 +32,9 @@ class BioSim:
     def __init__(self, island_map, ini_pop=None, seed=1,
                  vis_years=1, ymax_animals=None, cmax_animals=None, hist_specs=None,
                  img_dir=None, img_base=None, img_years=None,
-                 log_file=None):
+                 log_file=None, engine="serial", workers=1,
+                 log_format=None, log_flush_years=10, log_cells=False, quiet=False, render_workers=1,
+                 profile=False):
         """
         :param island_map: Multi-line string specifying island geography
         :param ini_pop: List of dictionaries specifying initial population
@@ -22,6 +48,15 @@ class BioSim:
         :param img_fmt: String with file type for figures, e.g. ’png’
         :param img_years: years between visualizations saved to files (default: vis_years)
         :param log_file: If given, write animal counts to this file
+        :param engine: "serial" to simulate cell by cell, "vectorized" to simulate all cells at once
+        :param workers: Number of worker processes the serial engine splits the island over
+        :param log_format: "csv" or "binary", by default "binary" if log_file ends in .bin and "csv" otherwise
+        :param log_flush_years: Number of years of log records buffered before writing to log_file
+        :param log_cells: If True, also write the animal counts of every cell to <log_file>_cells
+        :param quiet: If True, nothing is printed while simulating
+        :param render_workers: Number of processes drawing and saving figures, if 0 figures are saved by the simulation
+        :param profile: If True, record time per phase, births and deaths in self.profile, and write them to
+                        <log_file>_profile if log_file is given
         If ymax_animals is None, the y-axis limit should be adjusted automatically.
         If cmax_animals is None, sensible, fixed default values should be used.
         cmax_animals is a dict mapping species names to numbers, e.g.,
@@ -39,23 +74,50 @@ class BioSim:
 
         self.current_year = 1
         self.island_map = island_map
+        # Landscape code of every cell of the map, indexed as [y - 1, x - 1]; only habitable cells become Land cells.
+        self.geography = parse_map(island_map)
+        self.habitable_map = habitable_cells(self.geography)
+        # Statistics of the animals alive at the end of the last simulated year.
+        self.statistics = PopulationStatistics(hist_specs, shape=self.geography.shape)
         self.ini_pop = ini_pop
         self.seed = seed
+        self.engine = engine
         self.vis_years = vis_years
+        self.hist_specs = hist_specs
+        self.quiet = quiet
+        self._log_options = {'fmt': log_format, 'flush_years': log_flush_years, 'per_cell': log_cells,
+                             'profile': profile}
+        self.log = None if log_file is None else YearLog(log_file, **self._log_options)
+        # PhaseStats of all simulated years, None if profiling is disabled.
+        self.profile = PhaseStats() if profile else None
+        self.img_years = vis_years if img_years is None else img_years
+        self.render_workers = render_workers
+        # The figure is drawn headless, so it is only built when it is written to file.
+        self.visualize = None
+        if vis_years and img_dir is not None:
+            self.visualize = Visualize(island_map, hist_specs=hist_specs, ymax_animals=ymax_animals,
+                                       cmax_animals=cmax_animals, img_dir=img_dir,
+                                       img_base='biosim' if img_base is None else img_base)
 
-        self.geography = [list(line) for line in self.island_map.splitlines()]
-        self.island_map = {}
-        for y_ax, x_line in enumerate(self.geography):
-            for x_ax, land_type in enumerate(x_line):
-                self.island_map[(x_ax + 1, y_ax + 1)] = land_type
-
-        self.habitable_map = {}
-        for coordinate in self.island_map:
-            if self.island_map[coordinate] != "W":
-                self.habitable_map[coordinate] = self.island_map[coordinate]
-
-        self.island = Island(self.habitable_map)
-        self.island.insert_pop(self.ini_pop)
+        if engine == "serial" and workers > 1:
+            self.island = TiledIsland(self.habitable_map, seed=self.seed, workers=workers)
+        elif engine == "serial":
+            self.island = Island(self.habitable_map, seed=self.seed)
+        elif engine == "vectorized" and workers > 1:
+            raise ValueError('The vectorized engine runs in a single process. Please use workers=1.')
+        elif engine == "vectorized":
+            self.island = VectorizedIsland(self.habitable_map, seed=self.seed)
+        else:
+            raise ValueError('Unknown engine {}. Please choose "serial" or "vectorized".'.format(engine))
+        if self.ini_pop:
+            try:
+                self.island.insert_pop(self.ini_pop)
+            except Exception:
+                # The caller gets no BioSim to close, so the worker processes are stopped here.
+                self.island.close()
+                raise
+        if profile:
+            self.island.enable_profile()
 
     def set_animal_parameters(self, species, params):
         """
@@ -63,6 +125,11 @@ class BioSim:
         :param species: String, name of animal species
         :param params: Dict with valid parameter specification for species
         """
+        if species not in animal_species:
+            raise ValueError('Unknown species {}. Please choose one of {}.'.format(species, ', '.join(animal_species)))
+        # Check and set the parameters in this process before the island passes them on to its worker processes.
+        animal_species[species].set_params(params)
+        self.island.set_animal_parameters(species, params)
 
     def set_landscape_parameters(self, landscape, params):
         """
@@ -70,51 +137,110 @@ class BioSim:
         :param landscape: String, code letter for landscape
         :param params: Dict with valid parameter specification for landscape
         """
+        _set_landscape_class_params(landscape, params)
+        self.island.set_landscape_parameters(landscape, params)
 
     def simulate(self, num_years):
         """
         Run simulation while visualizing the result.
         :param num_years: number of years to simulate
         """
-        herb_age = []
-        herb_weight = []
-        herb_fitness = []
-        carn_age = []
-        carn_weight = []
-        carn_fitness = []
-        for _ in range(1, num_years + 1):
-            print("*" * 10)
-            migrate_from_to_dict = {}
-            for cell in self.island.cells:
-                cell.replant()
-                cell.feeding()
-                cell.procreation()
-
-                cell_herb_age, cell_herb_weight, cell_herb_fitness, cell_carn_age, cell_carn_weight, cell_carn_fitness \
-                    = cell.aging()
-                herb_age += cell_herb_age
-                herb_weight += cell_herb_weight
-                herb_fitness += cell_herb_fitness
-                carn_age += cell_carn_age
-                carn_weight += cell_carn_weight
-                carn_fitness += cell_carn_fitness
-
-                # migrate_from_to_dict[cell.coord].append(cell.migration())
-                # print(cell.coord, len(cell.herb_pop))
-                # print(migrate_from_to_dict)
-            print("Herbivore:")
-            print(herb_age)
-            print(herb_weight)
-            print(herb_fitness)
-
-            print("Carnivore:")
-            print(carn_age)
-            print(carn_weight)
-            print(carn_fitness)
-
-            # for values in migrate_to_dict:
-            #     if location == cell.coord in self.island.cells:
-            #         pass
+        renderer = None
+        if self.visualize is not None:
+            self.visualize.setup(self.year + num_years)
+            if self.render_workers:
+                renderer = FrameRenderer(self.visualize, workers=self.render_workers)
+        # The years written so far are flushed and the render workers are stopped also when a year fails.
+        try:
+            for _ in range(1, num_years + 1):
+                self.statistics.reset()
+                self.island.annual_cycle(self.statistics)
+                self.current_year += 1
+                if self.profile is not None:
+                    self.profile.merge(self.island.take_profile())
+                    start = self.profile.clock()
+                if self.visualize is not None:
+                    save = self.img_years and self.year % self.img_years == 0
+                    if save or self.year % self.vis_years == 0:
+                        snapshot = self.visualize.record(self.year, self.statistics)
+                    if save and renderer is not None:
+                        renderer.submit(snapshot)
+                    elif save:
+                        self.visualize.draw(snapshot)
+                        self.visualize.save()
+                if self.profile is not None:
+                    if self.visualize is not None:
+                        self.profile.add('render', self.profile.clock() - start)
+                    self.profile.end_year(self.year, sum(self.statistics.num_animals_per_species.values()))
+                    start = self.profile.clock()
+                if self.log is not None:
+                    self.log.write(self.year, self.statistics, self.profile)
+                    if self.profile is not None:
+                        self.profile.add('log', self.profile.clock() - start)
+                if not self.quiet:
+                    self._print_summary()
+        finally:
+            try:
+                if self.log is not None:
+                    self.log.flush()
+            finally:
+                if renderer is not None:
+                    renderer.close()
+
+    def _print_summary(self):
+        """
+        Print the number of animals and their mean weight and fitness in the last simulated year.
+        """
+        print("Year {}:".format(self.year))
+        for species in self.statistics.species:
+            weight = self.statistics.moments[species]['weight']
+            fitness = self.statistics.moments[species]['fitness']
+            print("{}: {} animals, weight {:.2f} +/- {:.2f}, fitness {:.3f} +/- {:.3f}".format(
+                species, weight.count, weight.mean, weight.variance ** 0.5, fitness.mean, fitness.variance ** 0.5))
+
+    def save_checkpoint(self, path):
+        """
+        Save the complete state of the simulation to a checkpoint file.
+        :param path: String with path to the checkpoint file
+        """
+        header = {'island_map': self.island_map,
+                  'seed': self.seed,
+                  'engine': self.engine,
+                  'current_year': self.current_year,
+                  'hist_specs': self.hist_specs,
+                  'animal_params': {species: dict(animal.params) for species, animal in animal_species.items()},
+                  'landscape_params': {code: {'f_max': land.f_max} for code, land in landscapes.items()}}
+        write_checkpoint(path, header, self.island.export_state())
+
+    @classmethod
+    def load_checkpoint(cls, path, **kwargs):
+        """
+        Create a simulation that continues from a checkpoint file written by save_checkpoint. A log_file written by
+        the simulation that saved the checkpoint keeps its records up to the year of the checkpoint, and the resumed
+        simulation appends to it.
+        :param path: String with path to the checkpoint file
+        :param kwargs: Further BioSim arguments, e.g. vis_years or log_file. The island, seed, engine, histogram
+                       specifications and initial population are taken from the checkpoint and cannot be given.
+        :return: BioSim
+        """
+        fixed = sorted(set(kwargs) & {'island_map', 'ini_pop', 'seed', 'engine', 'hist_specs'})
+        if fixed:
+            raise ValueError('{} cannot be given when loading a checkpoint, it is stored in it.'.format(
+                ', '.join(fixed)))
+        header, state = read_checkpoint(path)
+        for species, params in header['animal_params'].items():
+            # A parameter the species does not use, like DeltaPhiMax of herbivores, is stored as None.
+            animal_species[species].set_params({name: value for name, value in params.items() if value is not None})
+        for code, params in header['landscape_params'].items():
+            _set_landscape_class_params(code, params)
+        log_file = kwargs.pop('log_file', None)
+        sim = cls(header['island_map'], seed=header['seed'], hist_specs=header['hist_specs'],
+                  engine=header['engine'], **kwargs)
+        sim.island.import_state(state)
+        sim.current_year = header['current_year']
+        if log_file is not None:
+            sim.log = YearLog(log_file, resume_year=sim.year, **sim._log_options)
+        return sim
 
     def add_population(self, population):
         """
@@ -122,17 +248,37 @@ class BioSim:
         :param population: List of dictionaries specifying population
         """
 
+    def close(self):
+        """
+        Stop the worker processes of the island, if any. The simulation cannot continue afterwards.
+        """
+        self.island.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
     @property
     def year(self):
         """Last year simulated."""
+        return self.current_year - 1
 
     @property
     def num_animals(self):
         """Total number of animals on island."""
+        return sum(self.num_animals_per_species.values())
 
     @property
     def num_animals_per_species(self):
         """Number of animals per species in island, as dictionary."""
+        return self.island.num_animals_per_species
+
+    @property
+    def pool_stats(self):
+        """Number of animals, capacity of the population arrays and unused fraction of it per species, as dictionary."""
+        return self.island.pool_stats()
 
 
 if __name__ == '__main__':
@@ -0,0 +1,75 @@
+import json
+import numpy as np
+import os
+import tempfile
+
+# Checkpoint files start with this magic string and the length of the JSON header as little-endian uint64.
+magic = b'BIOSIMCK'
+# Array blocks start at multiples of this many bytes, so they can be memory-mapped.
+alignment = 64
+
+
+def _aligned(offset: int) -> int:
+    return -(-offset // alignment) * alignment
+
+
+def write_checkpoint(path: str, header: dict, arrays: dict):
+    """
+    The Write_checkpoint function writes a JSON header followed by raw, aligned array blocks to one binary file. The
+    file is written under a temporary name in the same directory and then renamed to path, so an existing checkpoint
+    at path is only replaced by a complete one and memory maps of it stay valid.
+    param path: str
+    param header: dict of JSON serialisable values
+    param arrays: dict mapping name to numpy array
+    :return:
+    """
+    arrays = {name: np.ascontiguousarray(array) for name, array in arrays.items()}
+    table = {}
+    offset = 0
+    for name, array in arrays.items():
+        table[name] = {'dtype': array.dtype.str, 'shape': array.shape, 'offset': offset}
+        offset = _aligned(offset + array.nbytes)
+    header_bytes = json.dumps({'header': header, 'arrays': table}).encode()
+    data_start = _aligned(len(magic) + 8 + len(header_bytes))
+
+    handle, temporary = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(path)), suffix='.tmp')
+    try:
+        with os.fdopen(handle, 'wb') as checkpoint:
+            checkpoint.write(magic)
+            checkpoint.write(np.uint64(len(header_bytes)).astype('<u8').tobytes())
+            checkpoint.write(header_bytes)
+            for name, array in arrays.items():
+                checkpoint.seek(data_start + table[name]['offset'])
+                checkpoint.write(array.tobytes())
+            checkpoint.truncate(data_start + offset)
+        os.replace(temporary, path)
+    except BaseException:
+        os.remove(temporary)
+        raise
+
+
+def read_checkpoint(path: str, mmap=True):
+    """
+    The Read_checkpoint function reads a file written by write_checkpoint.
+    param path: str
+    param mmap: bool, if True the arrays are copy-on-write memory maps of the file instead of copies in memory
+    :return: header dict and dict mapping name to numpy array
+    """
+    with open(path, 'rb') as checkpoint:
+        if checkpoint.read(len(magic)) != magic:
+            raise ValueError('{} is not a BioSim checkpoint file.'.format(path))
+        header_length = int(np.frombuffer(checkpoint.read(8), dtype='<u8')[0])
+        content = json.loads(checkpoint.read(header_length).decode())
+        data_start = _aligned(len(magic) + 8 + header_length)
+
+        arrays = {}
+        for name, spec in content['arrays'].items():
+            dtype = np.dtype(spec['dtype'])
+            shape = tuple(spec['shape'])
+            if mmap and np.prod(shape) > 0:
+                arrays[name] = np.memmap(path, dtype=dtype, mode='c', offset=data_start + spec['offset'], shape=shape)
+            else:
+                checkpoint.seek(data_start + spec['offset'])
+                arrays[name] = np.frombuffer(checkpoint.read(int(np.prod(shape)) * dtype.itemsize),
+                                             dtype=dtype).reshape(shape).copy()
+    return content['header'], arrays
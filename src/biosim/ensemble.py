@@ -0,0 +1,222 @@
+from src.biosim.land import habitable_cells, parse_map
+from src.biosim.population import hunt
+from src.biosim.streams import pack_streams, spawn_streams, unpack_streams
+from src.biosim.vectorized import VectorizedIsland
+import numpy as np
+
+
+class ReplicateGenerator:
+    """
+    The ReplicateGenerator class draws like a numpy Generator for the animals of all copies of a ReplicatedIsland. The
+    numbers of the animals of copy r come from generator r, in the order the animals are stored, so every copy gets
+    the numbers it would get on an island of its own.
+    """
+
+    def __init__(self, generators: list, replicate: np.ndarray):
+        """
+        The Initialize function groups the animals by copy.
+        param generators: list with one numpy Generator per copy
+        param replicate: numpy array with the copy of every animal
+        """
+        self.generators = generators
+        self.order = np.argsort(replicate, kind='stable')
+        self.sizes = np.bincount(replicate, minlength=len(generators)).tolist()
+
+    def _draw(self, size: int, draw) -> np.ndarray:
+        """
+        The _Draw function draws the numbers of every copy from its generator and puts them in the order of the
+        animals.
+        """
+        if size != len(self.order):
+            raise ValueError('A ReplicateGenerator draws one number per animal, {} and not {}.'.format(
+                len(self.order), size))
+        values = np.empty(size)
+        values[self.order] = np.concatenate([np.zeros(0)] + [draw(generator, copy_size) for generator, copy_size
+                                                             in zip(self.generators, self.sizes)])
+        return values
+
+    def random(self, size: int) -> np.ndarray:
+        """
+        The Random function draws one uniform number in [0, 1) per animal.
+        """
+        return self._draw(size, lambda generator, copy_size: generator.random(copy_size))
+
+    def normal(self, loc: float, scale: float, size: int) -> np.ndarray:
+        """
+        The Normal function draws one normally distributed number per animal.
+        """
+        return self._draw(size, lambda generator, copy_size: generator.normal(loc, scale, copy_size))
+
+
+class ReplicatedIsland(VectorizedIsland):
+    """
+    The ReplicatedIsland class holds copies of the same island side by side in one VectorizedIsland, so every annual
+    phase advances all copies with the same array operations. Copy r is shifted by r times the width of the map. As
+    the border of the map is water, no animal can migrate from one copy into another. Every copy draws from the
+    random number streams of its own seed, so it runs exactly like a VectorizedIsland with that seed.
+    """
+
+    def __init__(self, land_map: dict, width: int, seeds: list):
+        """
+        The Initialize function creates the cells of all copies of the island.
+        param land_map: dict, the habitable cells of one copy
+        param width: int, number of columns of the island map
+        param seeds: list of int, one seed per copy
+        """
+        self.width = width
+        self.replicates = len(seeds)
+        self.copy_cells = len(land_map)
+        super().__init__({(x_ax + copy * width, y_ax): land_type for copy in range(self.replicates)
+                          for (x_ax, y_ax), land_type in land_map.items()}, seed=seeds[0])
+        self.replicate_streams = [self.streams] + [spawn_streams(seed) for seed in seeds[1:]]
+        # Copy of the island every cell belongs to. The cells of a copy follow one another.
+        self.replicate = (np.array([x_ax for x_ax, _ in self.coords], dtype=np.int64) - 1) // width
+
+    def insert_pop(self, pop: list):
+        """
+        The Insert_pop function inserts the same population of animals into every copy of the island.
+        param pop: list with the coordinates of one copy
+        :return:
+        """
+        super().insert_pop([{'loc': (item['loc'][0] + copy * self.width, item['loc'][1]), 'pop': item['pop']}
+                            for copy in range(self.replicates) for item in pop])
+
+    def _generator(self, phase: str, island_pop):
+        """
+        The _Generator function returns a ReplicateGenerator that gives the animals of every copy the numbers of the
+        stream of the phase of that copy.
+        param phase: str
+        param island_pop: IslandPopulation
+        :return: ReplicateGenerator
+        """
+        return ReplicateGenerator([streams[phase] for streams in self.replicate_streams],
+                                  self.replicate[island_pop.cell])
+
+    def _hunt(self):
+        """
+        The _Hunt function lets the carnivores of every copy hunt, see VectorizedIsland._hunt, with the feeding stream
+        of the copy. A copy without herbivores or carnivores draws nothing and keeps the order of its animals.
+        :return:
+        """
+        herbs = self.herb_pop
+        carns = self.carn_pop
+        counts = self.replicate_counts()
+        hunting = (counts['Herbivore'] > 0) & (counts['Carnivore'] > 0)
+        if not hunting.any():
+            return
+        herbs.sort_by_cell(np.where(hunting[self.replicate[herbs.cell]], herbs.fitness, np.arange(len(herbs))))
+        carn_replicate = self.replicate[carns.cell]
+        order = np.arange(len(carns), dtype=float)
+        drawing = np.flatnonzero(hunting[carn_replicate])
+        order[drawing] = ReplicateGenerator([streams['feeding'] for streams in self.replicate_streams],
+                                            carn_replicate[drawing]).random(len(drawing))
+        carns.sort_by_cell(order)
+        prey, prey_end = herbs.segments(len(self))
+        hunter, hunter_end = carns.segments(len(self))
+        for copy in np.flatnonzero(hunting).tolist():
+            cells = slice(copy * self.copy_cells, (copy + 1) * self.copy_cells)
+            hunt(herbs, carns, prey[cells], prey_end[cells], hunter[cells], hunter_end[cells],
+                 self.replicate_streams[copy]['feeding'])
+        herbs.remove_dead()
+
+    def aging(self, statistics=None):
+        """
+        The Aging function ages every animal of all copies and removes the dead. Instead of statistics it returns the
+        number of animals of every copy.
+        param statistics: not used
+        :return: dict mapping species to numpy array with one count per copy
+        """
+        for island_pop in (self.herb_pop, self.carn_pop):
+            island_pop.aging(self._generator('aging', island_pop))
+        return self.replicate_counts()
+
+    def replicate_counts(self) -> dict:
+        """
+        The Replicate_counts function counts the animals of every species in every copy of the island.
+        :return: dict mapping species to numpy array with one count per copy
+        """
+        return {species: np.bincount(self.replicate[island_pop.cell], minlength=self.replicates)
+                for species, island_pop in (('Herbivore', self.herb_pop), ('Carnivore', self.carn_pop))}
+
+    def export_state(self) -> dict:
+        """
+        The Export_state function collects the state of all copies, see VectorizedIsland.export_state, with one row
+        of streams per copy.
+        :return: dict mapping name to numpy array
+        """
+        state = super().export_state()
+        state['streams'] = np.array([pack_streams(streams) for streams in self.replicate_streams], dtype=np.uint64)
+        return state
+
+    def import_state(self, state: dict):
+        """
+        The Import_state function restores all copies from arrays made by export_state.
+        param state: dict mapping name to numpy array
+        :return:
+        """
+        super().import_state(state)
+        for streams, packed in zip(self.replicate_streams, state['streams']):
+            unpack_streams(streams, packed)
+
+
+class BioSimEnsemble:
+    """
+    The BioSimEnsemble class runs many replicates of the same simulation in one process, on a ReplicatedIsland. The
+    cost of a year grows with the number of animals of all replicates, but the Python overhead of a year is paid once
+    for the whole ensemble. Replicate i draws from the random number streams of seeds[i] only, so it gives the same
+    result as a BioSim with engine "vectorized" and seed seeds[i], whatever the other seeds are.
+    """
+
+    def __init__(self, island_map, ini_pop=None, seeds=(1,)):
+        """
+        :param island_map: Multi-line string specifying island geography
+        :param ini_pop: List of dictionaries specifying the initial population of every replicate
+        :param seeds: List of non-negative integers, one per replicate
+        """
+        self.seeds = list(seeds)
+        if not self.seeds:
+            raise ValueError('Please give at least one seed.')
+        if any(isinstance(seed, bool) or not isinstance(seed, (int, np.integer)) or seed < 0 for seed in self.seeds):
+            raise ValueError('Seeds must be non-negative integers.')
+        geography = parse_map(island_map)
+        self.island = ReplicatedIsland(habitable_cells(geography), geography.shape[1], self.seeds)
+        self.current_year = 1
+        # Years simulated and number of animals per species in every replicate at the end of each of them.
+        self.years = np.zeros(0, dtype=np.int64)
+        self.counts = {species: np.zeros((0, len(self.seeds)), dtype=np.int64)
+                       for species in ('Herbivore', 'Carnivore')}
+        if ini_pop:
+            self.add_population(ini_pop)
+
+    def add_population(self, population):
+        """
+        Add the same population to every replicate.
+        :param population: List of dictionaries specifying population
+        """
+        self.island.insert_pop(population)
+
+    def simulate(self, num_years):
+        """
+        Run all replicates for a number of years.
+        :param num_years: number of years to simulate
+        :return: dict mapping species to numpy array with one row per simulated year and one column per replicate
+        """
+        counts = {species: np.zeros((num_years, len(self.seeds)), dtype=np.int64) for species in self.counts}
+        for year in range(num_years):
+            for species, replicate_counts in self.island.annual_cycle().items():
+                counts[species][year] = replicate_counts
+            self.current_year += 1
+        self.years = np.concatenate((self.years, np.arange(self.current_year - num_years, self.current_year)))
+        for species in self.counts:
+            self.counts[species] = np.concatenate((self.counts[species], counts[species]))
+        return counts
+
+    @property
+    def year(self):
+        """Last year simulated."""
+        return self.current_year - 1
+
+    @property
+    def num_animals_per_species(self):
+        """Number of animals per species in every replicate, as dictionary of numpy arrays."""
+        return self.island.replicate_counts()
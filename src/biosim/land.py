@@ -1,27 +1,124 @@
-from src.biosim.animals import Herbivore, Carnivore
-import random
+from src.biosim.animals import Herbivore, Carnivore, animal_species
+from src.biosim.population import Population, hunt, load_populations, pool_stats
+from src.biosim.profiling import PhaseStats
+from src.biosim.statistics import PopulationStatistics
+from src.biosim.streams import pack_streams, phases, restore_streams, spawn_streams
+import numpy as np
 
 
 class Island:
     """
-    The Island class creates a set of cells that represents each coordinate of the island.
+    The Island class creates a set of cells that represents each coordinate of the island. The annual phases only run
+    on the active cells, the cells holding animals, and on the cells animals migrate into, so the cost of a year
+    depends on the occupied part of the island rather than its area. The grass of all cells is kept in one array,
+    which is replanted at once.
     """
 
-    def __init__(self, land_map: dict):
+    def __init__(self, land_map: dict, seed=1, halo=()):
         """
         The Initialize function creates set of cells that represent habitable coordinate of the island.
         param land_map: dict
+        param seed: int, every cell derives its own random number streams from seed and its coordinate, so results do
+                    not depend on the order in which cells are processed
+        param halo: coordinates of habitable cells next to land_map that belong to another part of the island
         """
         self.land_map = land_map
-        # Create an empty set of cells to store Land class information.
-        self.cells = set()
-        for coord in self.land_map:
-            if self.land_map[coord] == "L":
-                self.cells.add(LowLand(coord))
-            elif self.land_map[coord] == "H":
-                self.cells.add(HighLand(coord))
-            elif self.land_map[coord] == "D":
-                self.cells.add(Desert(coord))
+        # Landscape letter, max vegetation and grass of every cell, in the order of land_map. Every cell reads and
+        # writes its own entry of grass.
+        self.letters = np.array(list(land_map.values()), dtype='U1')
+        self.f_max = np.zeros(len(land_map))
+        for code, land in landscapes.items():
+            self.f_max[self.letters == code] = land.f_max
+        self.grass = self.f_max.copy()
+        # Index the cells by coordinate for constant time lookup.
+        self.cell_map = {coord: landscapes[land_type](coord, seed, self.grass, self.f_max, idx)
+                         for idx, (coord, land_type) in enumerate(land_map.items())}
+        self.cells = set(self.cell_map.values())
+        self.halo = {coord: Halo(coord) for coord in halo}
+        # Precompute the neighbour table of every cell once.
+        for cell in self.cells:
+            x_ax, y_ax = cell.coord
+            cell.neighbours = tuple(self.cell_map.get((x_ax + dx, y_ax + dy)) or self.halo.get((x_ax + dx, y_ax + dy))
+                                    or cell for dx, dy in directions)
+        # Cells holding animals.
+        self.active = set()
+        # PhaseStats filled by the annual cycle when profiling is enabled.
+        self.profile = None
+
+    def enable_profile(self, enabled=True):
+        """
+        The Enable_profile function starts or stops recording phase times, births and deaths.
+        param enabled: bool
+        :return:
+        """
+        self.profile = PhaseStats() if enabled else None
+
+    def take_profile(self):
+        """
+        The Take_profile function returns the records since the last call and starts a new PhaseStats.
+        :return: PhaseStats, or None if profiling is disabled
+        """
+        profile = self.profile
+        if profile is not None:
+            self.profile = PhaseStats()
+        return profile
+
+    def _animals(self) -> int:
+        return sum(len(cell.herb_pop) + len(cell.carn_pop) for cell in self.active)
+
+    def _profiled_phase(self, phase: str):
+        """
+        The _Profiled_phase function runs one phase on every active cell and records its time and the change in the
+        number of animals. Every cell draws from its own random number streams and migrants only settle after all
+        phases, so running the cells phase by phase gives the same result as cell by cell.
+        """
+        before = self._animals()
+        start = self.profile.clock()
+        for cell in self.active:
+            getattr(cell, phase)()
+        self.profile.add(phase, self.profile.clock() - start, before)
+        return self._animals() - before
+
+    def set_animal_parameters(self, species: str, params: dict):
+        """
+        The Set_animal_parameters function updates the parameters of a species, see Animal.set_params.
+        param species: str
+        param params: dict
+        :return:
+        """
+        animal_species[species].set_params(params)
+
+    def set_landscape_parameters(self, landscape: str, params: dict):
+        """
+        The Set_landscape_parameters function changes the max vegetation of all cells of a landscape at once. The new
+        value takes effect at the next replant.
+        param landscape: str, landscape code letter
+        param params: dict, e.g. {'f_max': 700}
+        :return:
+        """
+        if 'f_max' in params:
+            self.f_max[self.letters == landscape] = params['f_max']
+
+    def get_cell(self, coord: tuple):
+        """
+        The Get_cell function returns the Land cell at a coordinate.
+        param coord: tuple
+        :return: Land
+        """
+        try:
+            return self.cell_map[coord]
+        except KeyError:
+            raise ValueError('Location {} is not a habitable cell of the island.'.format(coord)) from None
+
+    def neighbours(self, coord: tuple) -> list:
+        """
+        The Neighbours function returns the habitable cells north, south, east and west of a coordinate.
+        param coord: tuple
+        :return: list
+        """
+        cell = self.get_cell(coord)
+        return [neighbour for neighbour in cell.neighbours
+                if neighbour is not cell and neighbour.coord in self.cell_map]
 
     def insert_pop(self, pop: list):
         """
@@ -29,25 +126,184 @@ class Island:
         param pop: list
         :return:
         """
-        location = None
-        population = None
         for item in pop:
-            location = item['loc']
-            population = item['pop']
-
-            # Iterate through all Land Cells to identify the location in which population needs to be inserted.
-            for cell in self.cells:
-                if cell.coord == location:
-                    for animal in population:
-                        animal['fitness'] = 0.0
-                        if animal['species'] == 'Herbivore':
-                            # Create dictionary value of Herbivore and store in herbivore population list in Land Cell.
-                            herbivore = Herbivore(animal).get_dict()
-                            cell.herb_pop.append(herbivore)
-                        elif animal['species'] == 'Carnivore':
-                            # Create dictionary value of Carnivore and store in carnivore population list in Land Cell.
-                            carnivore = Carnivore(animal).get_dict()
-                            cell.carn_pop.append(carnivore)
+            cell = self.get_cell(item['loc'])
+            for species, cell_pop in (('Herbivore', cell.herb_pop), ('Carnivore', cell.carn_pop)):
+                animals = [animal for animal in item['pop'] if animal['species'] == species]
+                if animals:
+                    cell_pop.append([animal['age'] for animal in animals],
+                                    [animal['weight'] for animal in animals])
+                    self.active.add(cell)
+
+    def annual_cycle(self, statistics=None):
+        """
+        The Annual_cycle function runs replant, feeding, procreation, migration and aging on every cell for one year.
+        param statistics: PopulationStatistics to fill with the surviving animals, a new one if None
+        :return: PopulationStatistics
+        """
+        self.local_phases()
+        return self.settle_and_age(statistics)
+
+    def local_phases(self):
+        """
+        The Local_phases function replants all cells and runs feeding, procreation and migration on every active cell.
+        :return:
+        """
+        if self.profile is not None:
+            start = self.profile.clock()
+            self.replant()
+            self.profile.add('replant', self.profile.clock() - start, self._animals())
+            self.profile.deaths -= self._profiled_phase('feeding')
+            self.profile.births += self._profiled_phase('procreation')
+            self._profiled_phase('migration')
+            return
+        self.replant()
+        for cell in self.active:
+            cell.feeding()
+            cell.procreation()
+            cell.migration()
+
+    def replant(self):
+        """
+        The Replant function resets the grass of every cell to its max vegetation.
+        :return:
+        """
+        self.grass[:] = self.f_max
+
+    def collect_emigrants(self) -> dict:
+        """
+        The Collect_emigrants function removes the animals that migrated into halo cells this year.
+        :return: dict mapping halo coordinate to (herbivore blocks, carnivore blocks)
+        """
+        emigrants = {}
+        for coord, halo in self.halo.items():
+            if halo.herb_incoming or halo.carn_incoming:
+                emigrants[coord] = (halo.herb_incoming, halo.carn_incoming)
+                halo.herb_incoming, halo.carn_incoming = [], []
+        return emigrants
+
+    def receive_immigrants(self, immigrants: dict):
+        """
+        The Receive_immigrants function adds animals migrating in from another part of the island to the incoming
+        buffers of their cells.
+        param immigrants: dict mapping coordinate to (herbivore blocks, carnivore blocks)
+        :return:
+        """
+        for coord, (herb_blocks, carn_blocks) in immigrants.items():
+            cell = self.cell_map[coord]
+            cell.herb_incoming.extend(herb_blocks)
+            cell.carn_incoming.extend(carn_blocks)
+            self.active.add(cell)
+
+    def settle_and_age(self, statistics=None):
+        """
+        The Settle_and_age function settles this year's migrants and runs aging on every active cell and every cell
+        migrants arrived in. Cells left without animals become idle and are not added to the statistics.
+        param statistics: PopulationStatistics to fill with the surviving animals, a new one if None
+        :return: PopulationStatistics
+        """
+        statistics = PopulationStatistics() if statistics is None else statistics
+        # Migrants only move to neighbours, so the cells they arrived in are found next to the active cells.
+        self.active.update([neighbour for cell in self.active for neighbour in cell.neighbours
+                            if (neighbour.herb_incoming or neighbour.carn_incoming) and neighbour in self.cells])
+        for cell in self.active:
+            cell.settle_migrants()
+        if self.profile is not None:
+            before = self._animals()
+            start = self.profile.clock()
+        active = set()
+        for cell in self.active:
+            herb_age, herb_weight, herb_fitness, carn_age, carn_weight, carn_fitness = cell.aging()
+            if len(herb_age) or len(carn_age):
+                statistics.add('Herbivore', herb_age, herb_weight, herb_fitness, cell.coord)
+                statistics.add('Carnivore', carn_age, carn_weight, carn_fitness, cell.coord)
+                active.add(cell)
+        self.active = active
+        statistics.flush()
+        if self.profile is not None:
+            self.profile.add('aging', self.profile.clock() - start, before)
+            self.profile.deaths += before - self._animals()
+        return statistics
+
+    @property
+    def num_animals_per_species(self) -> dict:
+        """Number of animals per species on the island, as dictionary."""
+        return {'Herbivore': sum(len(cell.herb_pop) for cell in self.cells),
+                'Carnivore': sum(len(cell.carn_pop) for cell in self.cells)}
+
+    def cell_counts(self) -> dict:
+        """
+        The Cell_counts function returns the number of herbivores and carnivores of every habitable cell.
+        :return: dict mapping coordinate to (herbivores, carnivores)
+        """
+        return {coord: (len(cell.herb_pop), len(cell.carn_pop)) for coord, cell in self.cell_map.items()}
+
+    def pool_stats(self) -> dict:
+        """
+        The Pool_stats function reports the memory held by the populations of all cells, see population.pool_stats.
+        :return: dict mapping species to {'animals': int, 'capacity': int, 'fragmentation': float}
+        """
+        return {'Herbivore': pool_stats(cell.herb_pop for cell in self.cells),
+                'Carnivore': pool_stats(cell.carn_pop for cell in self.cells)}
+
+    def close(self):
+        """
+        The Close function releases the resources of the island. The island runs in this process, so there are none.
+        :return:
+        """
+
+    def export_state(self) -> dict:
+        """
+        The Export_state function collects grass, populations and random number generator states of all cells, ordered
+        by coordinate, into flat arrays. The streams of cells that never drew are stored as zeros.
+        :return: dict mapping name to numpy array
+        """
+        cells = [self.cell_map[coord] for coord in sorted(self.cell_map)]
+        # The states of all cells go into one flat list of integers, which the garbage collector does not need to
+        # scan, instead of a list per cell.
+        streams = []
+        for cell in cells:
+            cell.packed_streams(streams)
+        state = {'coords': np.array([cell.coord for cell in cells], dtype=np.int64).reshape(-1, 2),
+                 'grass': self.grass[np.array([cell.idx for cell in cells], dtype=np.int64)],
+                 'streams': np.array(streams, dtype=np.uint64).reshape(-1, len(phases), 6)}
+        for prefix in ('herb', 'carn'):
+            populations = [getattr(cell, prefix + '_pop') for cell in cells]
+            state[prefix + '_count'] = np.array([len(cell_pop) for cell_pop in populations], dtype=np.int64)
+            for field, dtype in (('age', np.int64), ('weight', float), ('fitness', float)):
+                state[prefix + '_' + field] = np.concatenate([np.zeros(0, dtype=dtype)] +
+                                                             [getattr(cell_pop, field) for cell_pop in populations])
+        return state
+
+    def import_state(self, state: dict):
+        """
+        The Import_state function restores the cells of this island from arrays made by export_state. Cells of the
+        state that do not belong to this island are skipped.
+        param state: dict mapping name to numpy array
+        :return:
+        """
+        # The cells keep slices of the arrays as their populations, so they must not share memory with the state, e.g.
+        # memory maps of a checkpoint file that is overwritten later. One copy of every array is made here.
+        state = {name: np.array(array) for name, array in state.items()}
+        cells = [self.cell_map.get(coord) for coord in map(tuple, state['coords'].tolist())]
+        present = [idx for idx, cell in enumerate(cells) if cell is not None]
+        self.grass[[cells[idx].idx for idx in present]] = state['grass'][present]
+        for prefix in ('herb', 'carn'):
+            load_populations([None if cell is None else getattr(cell, prefix + '_pop') for cell in cells],
+                             state[prefix + '_count'], age=state[prefix + '_age'], weight=state[prefix + '_weight'],
+                             fitness=state[prefix + '_fitness'])
+
+        # The generators of a cell are only restored when it draws, see Land.streams.
+        used = state['streams'].any(axis=(1, 2)).tolist()
+        occupied = (state['herb_count'] + state['carn_count'] > 0).tolist()
+        for idx in present:
+            cell = cells[idx]
+            cell._streams = None
+            cell._packed_streams = state['streams'][idx] if used[idx] else None
+            if occupied[idx]:
+                self.active.add(cell)
+            else:
+                self.active.discard(cell)
 
 
 class Land:
@@ -56,22 +312,71 @@ class Land:
     """
     f_max = None
 
-    def __init__(self, coord):
+    def __init__(self, coord, seed=1, vegetation=None, max_vegetation=None, idx=0):
         """
         The Initialize function creates a basic land or cell to store animal population.
         param coord: tuple
+        param seed: int, the cell draws from random number streams derived from seed and coord, one per phase
+        param vegetation: numpy array with the grass of all cells of the island, a new one-cell array if None
+        param max_vegetation: numpy array with the max vegetation of all cells of the island, f_max if None
+        param idx: int, the entry of this cell in vegetation and max_vegetation
         """
-        self.grass = self.f_max
+        self.vegetation = np.array([self.f_max]) if vegetation is None else vegetation
+        self.max_vegetation = np.array([self.f_max]) if max_vegetation is None else max_vegetation
+        self.idx = idx
         self.coord = coord
-        self.herb_pop = []
-        self.carn_pop = []
+        self.seed = seed
+        self._streams = None
+        # Stream states restored from a checkpoint, turned into generators when the cell first draws.
+        self._packed_streams = None
+        self.herb_pop = Population(Herbivore)
+        self.carn_pop = Population(Carnivore)
+        # (source coordinate, block) pairs of animals, as returned by Population.take, that migrated into the cell
+        # this year.
+        self.herb_incoming = []
+        self.carn_incoming = []
+        # Cells north, south, east and west of this cell; the cell itself stands in for water. Set by Island.
+        self.neighbours = (self, self, self, self)
+
+    @property
+    def streams(self) -> dict:
+        """Random number generators of the cell, one per phase, created when the cell first draws."""
+        if self._streams is None and self._packed_streams is None:
+            self._streams = spawn_streams(self.seed, *self.coord)
+        elif self._streams is None:
+            self._streams = restore_streams(self._packed_streams)
+            self._packed_streams = None
+        return self._streams
+
+    def packed_streams(self, out: list):
+        """
+        The Packed_streams function appends the state of the random number streams of the cell to a flat list, see
+        pack_streams. The streams of a cell that never drew are stored as zeros.
+        param out: list
+        :return:
+        """
+        if self._streams is not None:
+            pack_streams(self._streams, out)
+        elif self._packed_streams is not None:
+            out.extend(self._packed_streams.ravel().tolist())
+        else:
+            out.extend([0] * (6 * len(phases)))
+
+    @property
+    def grass(self) -> float:
+        """Amount of grass left in the cell."""
+        return self.vegetation[self.idx]
+
+    @grass.setter
+    def grass(self, value: float):
+        self.vegetation[self.idx] = value
 
     def replant(self):
         """
         The Replant function updates the value of land to max vegetation or max grass at the beginning of year.
         :return:
         """
-        self.grass = self.f_max
+        self.vegetation[self.idx] = self.max_vegetation[self.idx]
 
     def reduce_grass(self, fodder: float):
         """
@@ -83,146 +388,101 @@ class Land:
 
     def feeding(self):
         """
-        The Feeding function loops through the animal list for feeding them annually.
+        The Feeding function lets the herbivores graze, the fittest first, and then the carnivores hunt.
         :return:
         """
-        # Sort the herbivore population in descending order of fitness.
-        if len(self.herb_pop) > 1:
-            self.herb_pop.sort(key=lambda x: x['fitness'], reverse=True)
-
-        for herb in self.herb_pop:
-            # If no grass available in Land Cell break the for loop to avoid feeding rest of the herbivores.
-            if self.grass <= 0:
-                break
-            # Based on grass consumed, update herbivore's weight and fitness, and reduce total grass from Land Cell.
-            else:
-                grass_consumed, herb['weight'], herb['fitness'] = Herbivore(herb).eat(self.grass)
-                self.reduce_grass(grass_consumed)
-
-        # Sort the herbivore population in ascending order of fitness for carnivore consumption.
-        if len(self.herb_pop) > 1:
-            self.herb_pop.sort(key=lambda x: x['fitness'], reverse=False)
-
-        # Create a copy "hunters" from carnivore population.
-        hunters = self.carn_pop.copy()
-
-        # While hunters exists and herbivores are available randomly choose carnivores from hunters to hunt and feed.
-        while len(hunters) != 0:
-            # Identify the carnivore index number and carnivore randomly chosen from hunters.
-            carn_idx = random.choice(range(0, len(hunters)))
-            carn = Carnivore(hunters[carn_idx])
-
-            # Update the herbivore population by removing herbivores that have been hunted or eaten by carnivores.
-            self.herb_pop = carn.eat(preys=self.herb_pop)
-
-            # Update the carnivore's weight and fitness in the carnivore population and remove from hunters to avoid
-            # getting randomly chosen again.
-            self.carn_pop[carn_idx] = carn.get_dict()
-            hunters.pop(carn_idx)
-
-            # If no herbivores left after eating then break from the loop.
-            if len(self.herb_pop) == 0:
-                break
-
+        herbs = self.herb_pop
+        carns = self.carn_pop
+
+        # One sort orders the herbivores by ascending fitness for the carnivores; they graze in the reverse order,
+        # the fittest first, each eating F or what is left.
+        herbs.sort_by_fitness()
+        params = Herbivore.compiled_params()
+        grazing_rank = np.arange(len(herbs) - 1, -1, -1)
+        grass = self.vegetation[self.idx]
+        intake = np.clip(grass - params.F * grazing_rank, 0, params.F)
+        herbs.weight[:] += params.beta * intake
+        self.vegetation[self.idx] = grass - intake.sum()
+        herbs.update_fitness()
+        # Weight gain seldom changes the order by fitness, so the herbivores are only sorted again if it did.
+        if np.any(herbs.fitness[1:] < herbs.fitness[:-1]):
+            herbs.sort_by_fitness()
+
+        # Carnivores hunt in random order, trying the weakest herbivores first.
+        if len(herbs) and len(carns):
+            carns.reorder(self.streams['feeding'].permutation(len(carns)))
+            hunt(herbs, carns, [0], [len(herbs)], [0], [len(carns)], self.streams['feeding'])
+            herbs.remove_dead()
 
     def procreation(self):
         """
-        The Procreation function loops through animal list for giving birth to child annually.
-        :return:
-        """
-        child_list = []
-
-        for herb in self.herb_pop:
-            animal = Herbivore(herb)
-            birth_status, child_weight = animal.birth(len(self.herb_pop))
-            # If birth status is True, update the herbivore's weight and fitness.
-            # Also create a child herbivore and add to child list.
-            if birth_status:
-                herb = animal.get_dict()
-                child_list.append(Herbivore({'species': 'Herbivore', 'age': 0.0, 'weight': child_weight,
-                                             'fitness': 0.0}).get_dict())
-        # Add the children to herbivore population.
-        self.herb_pop += child_list
-        print(self.herb_pop)
-
-        # Empty all the herbivores from the child list to store children of carnivores.
-        child_list.clear()
-
-        for carn in self.carn_pop:
-            animal = Carnivore(carn)
-            birth_status, child_weight = animal.birth(len(self.carn_pop))
-            # If birth status is True, update the carnivore's weight and fitness.
-            # Also create a child carnivore and add to child list.
-            if birth_status:
-                carn = animal.get_dict()
-                child_list.append(Carnivore({'species': 'Carnivore', 'age': 0.0, 'weight': child_weight,
-                                             'fitness': 0.0}).get_dict())
-        # Add the children to carnivore population.
-        self.carn_pop += child_list
+        The Procreation function lets the animals of each species give birth, see Population.procreation.
+        :return:
+        """
+        for cell_pop in (self.herb_pop, self.carn_pop):
+            if len(cell_pop):
+                cell_pop.procreation(len(cell_pop), self.streams['procreation'])
 
     def aging(self):
         """
-        The Aging function loops through animal list to increase age, reduce weight due to loss and check probability
-        of death.
-        :return:
+        The Aging function increases age, reduces weight due to loss and checks probability of death for the whole
+        population of each species at once.
+        :return: age, weight and fitness arrays of surviving herbivores and carnivores for plotting histograms. These
+                 are views into the populations and change when the populations do.
         """
-        # Create empty list to store herbivore and carnivore - age, weight and fitness for plotting histogram.
-        herb_age = []
-        herb_weight = []
-        herb_fitness = []
-        carn_age = []
-        carn_weight = []
-        carn_fitness = []
-
-        # Create empty list to store index numbers of herbivores and carnivores whose death status is True.
-        dead_herb_idx = []
-        dead_carn_idx = []
-
-        for i, herb in enumerate(self.herb_pop):
-            animal = Herbivore(herb)
-            animal.aging()
-            animal.weight_loss()
-            if animal.death():
-                dead_herb_idx.append(i)
-            else:
-                herb = animal.get_dict()
-                herb_age.append(herb['age'])
-                herb_weight.append(herb['weight'])
-                herb_fitness.append(herb['fitness'])
-
-        for i, carn in enumerate(self.carn_pop):
-            animal = Carnivore(carn)
-            animal.aging()
-            animal.weight_loss()
-            if animal.death():
-                dead_carn_idx.append(i)
-            else:
-                carn = animal.get_dict()
-                carn_age.append(carn['age'])
-                carn_weight.append(carn['weight'])
-                carn_fitness.append(carn['fitness'])
+        for cell_pop in (self.herb_pop, self.carn_pop):
+            if len(cell_pop):
+                cell_pop.aging(self.streams['aging'])
 
-        for idx in dead_herb_idx:
-            self.herb_pop.pop(idx)
-        for idx in dead_carn_idx:
-            self.carn_pop.pop(idx)
-
-        return herb_age, herb_weight, herb_fitness, carn_age, carn_weight, carn_fitness
+        return (self.herb_pop.age, self.herb_pop.weight, self.herb_pop.fitness,
+                self.carn_pop.age, self.carn_pop.weight, self.carn_pop.fitness)
 
     def migration(self):
         """
-        The Migration function loops through animal list to identify animals that need to migrate to another land or
-        cell.
+        The Migration function draws the migration of every animal of the cell in one batch. Migrants are written to
+        the incoming buffers of the neighbour cells, so they cannot move again before settle_migrants is called. An
+        animal that picks a water cell stays.
         :return:
         """
-        migration_list = []
-        for herb in self.herb_pop:
-            next_loc = herb.migrate(self.coord)
-            if next_loc is None:
+        for cell_pop, incoming in ((self.herb_pop, 'herb_incoming'), (self.carn_pop, 'carn_incoming')):
+            if len(cell_pop) == 0:
                 continue
-            else:
-                migration_list.append({next_loc: herb})
-        return migration_list
+            direction = cell_pop.draw_migrants(len(self.neighbours), self.streams['migration'])
+            moving = False
+            for idx, neighbour in enumerate(self.neighbours):
+                if neighbour is self:
+                    continue
+                leaving = direction == idx
+                if leaving.any():
+                    getattr(neighbour, incoming).append((self.coord, cell_pop.take(leaving)))
+                    cell_pop.alive[leaving] = False
+                    moving = True
+            if moving:
+                cell_pop.remove_dead()
+
+    def settle_migrants(self):
+        """
+        The Settle_migrants function moves the animals that arrived this year from the incoming buffers into the cell,
+        ordered by the cell they came from.
+        :return:
+        """
+        for cell_pop, incoming in ((self.herb_pop, self.herb_incoming), (self.carn_pop, self.carn_incoming)):
+            if incoming:
+                incoming.sort(key=lambda item: item[0])
+                cell_pop.extend([block for _, block in incoming])
+                incoming.clear()
+
+
+class Halo:
+    """
+    The Halo Class stands in for a habitable cell that belongs to another part of the island. It only collects the
+    animals migrating into it.
+    """
+
+    def __init__(self, coord):
+        self.coord = coord
+        self.herb_incoming = []
+        self.carn_incoming = []
 
 
 class LowLand(Land):
@@ -231,8 +491,8 @@ class LowLand(Land):
     """
     f_max = 50.0
 
-    def __init__(self, coord):
-        super().__init__(coord)
+    def __init__(self, coord, seed=1, vegetation=None, max_vegetation=None, idx=0):
+        super().__init__(coord, seed, vegetation, max_vegetation, idx)
 
 
 class HighLand(Land):
@@ -241,8 +501,8 @@ class HighLand(Land):
     """
     f_max = 20.0
 
-    def __init__(self, coord):
-        super().__init__(coord)
+    def __init__(self, coord, seed=1, vegetation=None, max_vegetation=None, idx=0):
+        super().__init__(coord, seed, vegetation, max_vegetation, idx)
 
 
 class Desert(Land):
@@ -251,5 +511,48 @@ class Desert(Land):
     """
     f_max = 0.0
 
-    def __init__(self, coord):
-        super().__init__(coord)
+    def __init__(self, coord, seed=1, vegetation=None, max_vegetation=None, idx=0):
+        super().__init__(coord, seed, vegetation, max_vegetation, idx)
+
+
+# Offsets of the cells north, south, east and west of a coordinate (x, y).
+directions = ((0, -1), (0, 1), (1, 0), (-1, 0))
+
+# Land class for every habitable landscape code letter.
+landscapes = {'L': LowLand, 'H': HighLand, 'D': Desert}
+
+
+def parse_map(island_map: str) -> np.ndarray:
+    """
+    The Parse_map function converts the island map into an array of one-byte landscape codes, indexed as
+    [y - 1, x - 1]. All rows must have the same length, the border must be water and every letter must be W or a key
+    of landscapes.
+    param island_map: str, multi-line string
+    :return: numpy array of dtype S1 with one row per line
+    """
+    lines = island_map.splitlines()
+    if not lines or not lines[0]:
+        raise ValueError('The island map is empty.')
+    if any(len(line) != len(lines[0]) for line in lines):
+        raise ValueError('All lines of the island map must have the same length.')
+    try:
+        geography = np.frombuffer(''.join(lines).encode('ascii'), dtype='S1').reshape(len(lines), len(lines[0]))
+    except UnicodeEncodeError:
+        raise ValueError('The island map may only contain the letters W, {}.'.format(', '.join(landscapes))) from None
+    if not np.isin(geography, [code.encode() for code in ('W', *landscapes)]).all():
+        raise ValueError('The island map may only contain the letters W, {}.'.format(', '.join(landscapes)))
+    border = np.concatenate((geography[0], geography[-1], geography[:, 0], geography[:, -1]))
+    if (border != b'W').any():
+        raise ValueError('The border of the island map must be water.')
+    return geography
+
+
+def habitable_cells(geography: np.ndarray) -> dict:
+    """
+    The Habitable_cells function returns the coordinate and landscape letter of every cell that is not water.
+    param geography: numpy array made by parse_map
+    :return: dict mapping (x, y) to landscape letter
+    """
+    y_ax, x_ax = np.nonzero(geography != b'W')
+    letters = geography[y_ax, x_ax].astype('U1').tolist()
+    return dict(zip(zip((x_ax + 1).tolist(), (y_ax + 1).tolist()), letters))
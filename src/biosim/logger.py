@@ -0,0 +1,133 @@
+import os
+import warnings
+import numpy as np
+from src.biosim.profiling import profile_columns
+
+# Columns of the per-year records and of the optional per-cell records.
+year_columns = ('Year', 'Herbivore', 'Carnivore')
+cell_columns = ('Year', 'x', 'y', 'Herbivore', 'Carnivore')
+
+
+def log_format(path: str, fmt=None) -> str:
+    """
+    The Log_format function returns the format of a log file: fmt if given, otherwise 'binary' for paths ending in
+    .bin and 'csv' for all others.
+    param path: str
+    param fmt: 'csv', 'binary' or None
+    :return: str
+    """
+    if fmt is not None:
+        return fmt
+    return 'binary' if path.endswith('.bin') else 'csv'
+
+
+class YearLog:
+    """
+    The YearLog class writes one record per simulated year with the number of animals per species to a log file, and
+    optionally the number of animals of every cell to a second file named <log_file>_cells and the births, deaths and
+    phase times of every year to a third file named <log_file>_profile. Records are buffered in
+    memory and written every flush_years years. The files are CSV with a header line by default, or, in binary
+    format, rows of little-endian 64 bit integers without header.
+    """
+    formats = ('csv', 'binary')
+
+    def __init__(self, path: str, fmt=None, flush_years=10, per_cell=False, profile=False, resume_year=None):
+        """
+        The Initialize function creates empty log files, replacing existing ones. With resume_year, existing files
+        keep their records up to that year instead, and new records are appended after them.
+        param path: str
+        param fmt: 'csv' or 'binary', if None 'binary' for paths ending in .bin and 'csv' otherwise
+        param flush_years: int, number of years buffered before writing
+        param per_cell: bool, if True also log the number of animals of every cell
+        param profile: bool, if True also log the PhaseStats records given to write
+        param resume_year: int, the last year whose records are kept, e.g. the year of a checkpoint, or None
+        """
+        self.path = path
+        self.fmt = log_format(path, fmt)
+        if self.fmt not in self.formats:
+            raise ValueError('Unknown log format {}. Please choose "csv" or "binary".'.format(self.fmt))
+        self.flush_years = flush_years
+        root, ext = os.path.splitext(path)
+        self.cell_path = root + '_cells' + ext if per_cell else None
+        self.profile_path = root + '_profile' + ext if profile else None
+        self._records = []
+        self._cell_records = []
+        self._profile_records = []
+
+        for file_path, columns in ((self.path, year_columns), (self.cell_path, cell_columns),
+                                   (self.profile_path, profile_columns)):
+            if file_path is None:
+                continue
+            rows = np.zeros((0, len(columns)), dtype='<i8')
+            if resume_year is not None and os.path.exists(file_path):
+                rows = _read_rows(file_path, self.fmt, columns)
+                rows = rows[rows[:, 0] <= resume_year]
+            with open(file_path, 'w' if self.fmt == 'csv' else 'wb') as log:
+                if self.fmt == 'csv':
+                    log.write(','.join(columns) + '\n')
+                    np.savetxt(log, rows, fmt='%d', delimiter=',')
+                else:
+                    rows.astype('<i8').tofile(log)
+
+    def write(self, year: int, statistics, profile=None):
+        """
+        The Write function buffers the records of one year and writes the buffer every flush_years years.
+        param year: int
+        param statistics: PopulationStatistics of the year
+        param profile: PhaseStats whose last finished year is logged, if profile logging is enabled
+        :return:
+        """
+        counts = statistics.num_animals_per_species
+        self._records.append((year, counts['Herbivore'], counts['Carnivore']))
+        if self.cell_path is not None:
+            self._cell_records.extend((year, x_ax, y_ax, cell.get('Herbivore', (0,))[0], cell.get('Carnivore', (0,))[0])
+                                      for (x_ax, y_ax), cell in sorted(statistics.cells.items()))
+        if self.profile_path is not None and profile is not None and profile.years:
+            self._profile_records.append(profile.record(profile.years[-1]))
+        if len(self._records) >= self.flush_years:
+            self.flush()
+
+    def flush(self):
+        """
+        The Flush function writes all buffered records to the log files.
+        :return:
+        """
+        for file_path, records, columns in ((self.path, self._records, year_columns),
+                                            (self.cell_path, self._cell_records, cell_columns),
+                                            (self.profile_path, self._profile_records, profile_columns)):
+            if file_path is None or not records:
+                continue
+            rows = np.array(records, dtype='<i8').reshape(-1, len(columns))
+            if self.fmt == 'csv':
+                with open(file_path, 'a') as log:
+                    np.savetxt(log, rows, fmt='%d', delimiter=',')
+            else:
+                with open(file_path, 'ab') as log:
+                    rows.tofile(log)
+            records.clear()
+
+
+def read_log(path: str, fmt=None, per_cell=False, profile=False) -> np.ndarray:
+    """
+    The Read_log function reads a log file written by YearLog.
+    param path: str
+    param fmt: 'csv' or 'binary', if None 'binary' for paths ending in .bin and 'csv' otherwise
+    param per_cell: bool, True for a per-cell log file
+    param profile: bool, True for a profile log file
+    :return: numpy array with one row per record
+    """
+    columns = profile_columns if profile else cell_columns if per_cell else year_columns
+    return _read_rows(path, log_format(path, fmt), columns)
+
+
+def _read_rows(path: str, fmt: str, columns: tuple) -> np.ndarray:
+    """
+    The _Read_rows function reads the records of a log file with the given columns.
+    """
+    if fmt == 'csv':
+        # A log that has not been flushed yet only holds the header.
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore', UserWarning)
+            rows = np.loadtxt(path, dtype=np.int64, delimiter=',', skiprows=1, ndmin=2)
+        return rows.reshape(-1, len(columns))
+    return np.fromfile(path, dtype='<i8').reshape(-1, len(columns))
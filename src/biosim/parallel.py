@@ -0,0 +1,238 @@
+from src.biosim.animals import animal_species
+from src.biosim.land import Island, directions, landscapes
+from src.biosim.population import pool_stats
+from src.biosim.profiling import PhaseStats
+from src.biosim.statistics import PopulationStatistics
+import multiprocessing
+import traceback
+import numpy as np
+
+
+def split_into_tiles(land_map: dict, workers: int) -> list:
+    """
+    The Split_into_tiles function splits the habitable coordinates of the island into a grid of rectangular tiles,
+    one per worker. Tiles without habitable cells are left out.
+    param land_map: dict
+    param workers: int
+    :return: list of dict, the land map of every tile
+    """
+    rows = int(np.sqrt(workers))
+    while workers % rows:
+        rows -= 1
+    columns = workers // rows
+    x_bounds = [chunk[0] for chunk in np.array_split(sorted({x_ax for x_ax, _ in land_map}), columns) if len(chunk)]
+    y_bounds = [chunk[0] for chunk in np.array_split(sorted({y_ax for _, y_ax in land_map}), rows) if len(chunk)]
+
+    tiles = {}
+    for coord, land_type in land_map.items():
+        tile = (np.searchsorted(x_bounds, coord[0], side='right'), np.searchsorted(y_bounds, coord[1], side='right'))
+        tiles.setdefault(tile, {})[coord] = land_type
+    return [tiles[tile] for tile in sorted(tiles)]
+
+
+def _tile_worker(connection, land_map: dict, halo: list, seed, animal_params: dict, landscape_params: dict):
+    """
+    The _Tile_worker function owns the Island of one tile in a worker process and runs the Island methods requested
+    by the main process until it receives None. The parameters of the main process are set first, as a worker that
+    is not forked starts with the default parameters.
+    """
+    for species, params in animal_params.items():
+        animal_species[species].params.update(params)
+    for code, params in landscape_params.items():
+        landscapes[code].f_max = params['f_max']
+    island = Island(land_map, seed=seed, halo=halo)
+    while True:
+        request = connection.recv()
+        if request is None:
+            break
+        method, args = request
+        # An error is sent back instead of the result, so the worker stays alive and the main process can raise it.
+        try:
+            reply = ('result', getattr(island, method)(*args))
+        except Exception as error:
+            reply = ('error', error)
+        try:
+            connection.send(reply)
+        except Exception:
+            # The result or the error could not be pickled.
+            connection.send(('error', RuntimeError(traceback.format_exc())))
+    connection.close()
+
+
+class TiledIsland:
+    """
+    The TiledIsland class simulates the island in rectangular tiles, one worker process per tile. Each tile runs the
+    local phases of its cells independently. Only the animals migrating across a tile border are exchanged, through
+    the halo cells of the tiles. Every cell draws from its own random number generator, so results are the same for
+    any number of workers.
+    """
+
+    def __init__(self, land_map: dict, seed=1, workers=2, start_method=None):
+        """
+        The Initialize function splits the island into tiles and starts one worker process per tile. The workers get
+        the current animal and landscape parameters.
+        param land_map: dict
+        param seed: int
+        param workers: int
+        param start_method: str, multiprocessing start method of the workers, the platform default if None
+        """
+        context = multiprocessing.get_context(start_method)
+        animal_params = {species: dict(animal.params) for species, animal in animal_species.items()}
+        landscape_params = {code: {'f_max': land.f_max} for code, land in landscapes.items()}
+        self.land_map = land_map
+        self.tiles = split_into_tiles(land_map, workers)
+        self.owner = {coord: idx for idx, tile in enumerate(self.tiles) for coord in tile}
+        self.connections = []
+        self.processes = []
+        for tile in self.tiles:
+            halo = sorted({(x_ax + dx, y_ax + dy) for x_ax, y_ax in tile for dx, dy in directions
+                           if (x_ax + dx, y_ax + dy) in land_map and (x_ax + dx, y_ax + dy) not in tile})
+            parent_connection, child_connection = context.Pipe()
+            process = context.Process(target=_tile_worker, daemon=True,
+                                      args=(child_connection, tile, halo, seed, animal_params, landscape_params))
+            process.start()
+            self.connections.append(parent_connection)
+            self.processes.append(process)
+
+    def _call(self, method: str, args_per_tile=None) -> list:
+        """
+        The _Call function runs an Island method on every tile in parallel and returns the results in tile order. The
+        replies of all tiles are collected before the error of the first tile that failed is raised.
+        param method: str
+        param args_per_tile: list with the argument tuple for every tile
+        :return: list
+        """
+        for idx, connection in enumerate(self.connections):
+            connection.send((method, () if args_per_tile is None else args_per_tile[idx]))
+        replies = [connection.recv() for connection in self.connections]
+        for kind, value in replies:
+            if kind == 'error':
+                raise value
+        return [value for _, value in replies]
+
+    def insert_pop(self, pop: list):
+        """
+        The Insert_pop function inserts population of animals to desired coordinate on the island.
+        param pop: list
+        :return:
+        """
+        pop_per_tile = [[] for _ in self.tiles]
+        for item in pop:
+            if item['loc'] not in self.owner:
+                raise ValueError('Location {} is not a habitable cell of the island.'.format(item['loc']))
+            pop_per_tile[self.owner[item['loc']]].append(item)
+        self._call('insert_pop', [(tile_pop,) for tile_pop in pop_per_tile])
+
+    def annual_cycle(self, statistics=None):
+        """
+        The Annual_cycle function runs one year on every tile. After the local phases the migrants that crossed a tile
+        border are handed to the tile that owns their new cell before settling and aging.
+        param statistics: PopulationStatistics to fill with the surviving animals, a new one if None
+        :return: PopulationStatistics
+        """
+        statistics = PopulationStatistics() if statistics is None else statistics
+        immigrants = [{} for _ in self.tiles]
+        self._call('local_phases')
+        for emigrants in self._call('collect_emigrants'):
+            for coord, (herb_blocks, carn_blocks) in emigrants.items():
+                tile_herb_blocks, tile_carn_blocks = immigrants[self.owner[coord]].setdefault(coord, ([], []))
+                tile_herb_blocks.extend(herb_blocks)
+                tile_carn_blocks.extend(carn_blocks)
+        self._call('receive_immigrants', [(tile_immigrants,) for tile_immigrants in immigrants])
+        tile_statistics = PopulationStatistics(statistics.hist_specs, statistics.shape)
+        for result in self._call('settle_and_age', [(tile_statistics,)] * len(self.tiles)):
+            statistics.merge(result)
+        return statistics
+
+    def set_animal_parameters(self, species: str, params: dict):
+        """
+        The Set_animal_parameters function updates the parameters of a species in every worker process.
+        param species: str
+        param params: dict
+        :return:
+        """
+        self._call('set_animal_parameters', [(species, params)] * len(self.tiles))
+
+    def set_landscape_parameters(self, landscape: str, params: dict):
+        """
+        The Set_landscape_parameters function changes the parameters of a landscape on every tile.
+        param landscape: str, landscape code letter
+        param params: dict, e.g. {'f_max': 700}
+        :return:
+        """
+        self._call('set_landscape_parameters', [(landscape, params)] * len(self.tiles))
+
+    def enable_profile(self, enabled=True):
+        """
+        The Enable_profile function starts or stops recording phase times, births and deaths on every tile.
+        param enabled: bool
+        :return:
+        """
+        self._call('enable_profile', [(enabled,)] * len(self.tiles))
+
+    def take_profile(self):
+        """
+        The Take_profile function returns the records of all tiles since the last call. Phase times are summed over
+        the tiles, so they measure work rather than wall time of the whole island.
+        :return: PhaseStats, or None if profiling is disabled
+        """
+        profiles = self._call('take_profile')
+        if profiles[0] is None:
+            return None
+        profile = PhaseStats()
+        for tile_profile in profiles:
+            profile.merge(tile_profile)
+        return profile
+
+    @property
+    def num_animals_per_species(self) -> dict:
+        """Number of animals per species on the island, as dictionary."""
+        counts = self._call('cell_counts')
+        return {'Herbivore': sum(herbs for tile in counts for herbs, _ in tile.values()),
+                'Carnivore': sum(carns for tile in counts for _, carns in tile.values())}
+
+    def cell_counts(self) -> dict:
+        """
+        The Cell_counts function returns the number of herbivores and carnivores of every habitable cell.
+        :return: dict mapping coordinate to (herbivores, carnivores)
+        """
+        counts = {}
+        for tile_counts in self._call('cell_counts'):
+            counts.update(tile_counts)
+        return counts
+
+    def pool_stats(self) -> dict:
+        """
+        The Pool_stats function reports the memory held by the populations of all tiles, see population.pool_stats.
+        :return: dict mapping species to {'animals': int, 'capacity': int, 'fragmentation': float}
+        """
+        tiles = self._call('pool_stats')
+        return {species: pool_stats(tile[species] for tile in tiles) for species in ('Herbivore', 'Carnivore')}
+
+    def export_state(self) -> dict:
+        """
+        The Export_state function collects the state of all tiles into flat arrays, see Island.export_state.
+        :return: dict mapping name to numpy array
+        """
+        states = self._call('export_state')
+        return {name: np.concatenate([state[name] for state in states]) for name in states[0]}
+
+    def import_state(self, state: dict):
+        """
+        The Import_state function restores every tile from arrays made by export_state.
+        param state: dict mapping name to numpy array
+        :return:
+        """
+        state = {name: np.asarray(array) for name, array in state.items()}
+        self._call('import_state', [(state,)] * len(self.tiles))
+
+    def close(self):
+        """
+        The Close function stops the worker processes.
+        :return:
+        """
+        for connection, process in zip(self.connections, self.processes):
+            connection.send(None)
+            process.join()
+        self.connections = []
+        self.processes = []
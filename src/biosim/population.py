@@ -0,0 +1,492 @@
+import math
+import numpy as np
+
+# Random number generator shared by the batch phases unless a generator is passed explicitly.
+default_rng = np.random.default_rng(1)
+
+# Zero-length arrays per dtype shared by all empty populations.
+_empty = {np.int64: np.zeros(0, dtype=np.int64), float: np.zeros(0, dtype=float), bool: np.zeros(0, dtype=bool)}
+
+
+class Population:
+    """
+    The Population class stores all animals of one species living in one cell as contiguous arrays.
+
+    Every animal occupies one slot in the ``age``, ``weight``, ``fitness`` and ``alive`` arrays. The land phases read
+    and write these arrays directly instead of creating an animal object per individual. Animals that die during a
+    phase are flagged in the ``alive`` mask and removed together by ``remove_dead``. The arrays keep spare capacity
+    beyond the last animal and grow geometrically, so adding newborns or migrants does not copy the population
+    every year. Sorting and removing the dead work in place, so the slots freed by deaths are reused by the next
+    births. Memory is only released when the unused fraction of the capacity exceeds max_fragmentation.
+    """
+    # Names of the per-animal arrays. Subclasses storing extra columns extend this tuple.
+    _fields = ('_age', '_weight', '_fitness', '_alive')
+    # Smallest number of slots allocated when the arrays grow.
+    min_capacity = 16
+    # Fraction of unused capacity above which remove_dead shrinks the arrays to twice the number of animals.
+    max_fragmentation = 0.75
+
+    def __init__(self, species):
+        """
+        The Initialize function creates an empty population for a species.
+        param species: Animal subclass whose params apply to this population
+        """
+        self.species = species
+        # Empty populations share zero-length arrays; the first animals added allocate their own.
+        self._age = _empty[np.int64]
+        self._weight = _empty[float]
+        self._fitness = _empty[float]
+        self._alive = _empty[bool]
+        self._size = 0
+
+    def __len__(self):
+        return self._size
+
+    @property
+    def capacity(self) -> int:
+        """Number of animals the arrays hold before they have to grow."""
+        return len(self._age)
+
+    @property
+    def fragmentation(self) -> float:
+        """Fraction of the capacity not holding animals."""
+        return 1 - self._size / self.capacity if self.capacity else 0.0
+
+    @property
+    def age(self) -> np.ndarray:
+        """Age of every animal in the population."""
+        return self._age[:self._size]
+
+    @property
+    def weight(self) -> np.ndarray:
+        """Weight of every animal in the population."""
+        return self._weight[:self._size]
+
+    @property
+    def fitness(self) -> np.ndarray:
+        """Fitness of every animal in the population."""
+        return self._fitness[:self._size]
+
+    @property
+    def alive(self) -> np.ndarray:
+        """Mask that is False for animals that died in the current phase."""
+        return self._alive[:self._size]
+
+    def append(self, age, weight, **columns):
+        """
+        The Append function adds one or more animals to the end of the population.
+        param age: int or array of int
+        param weight: float or array of float
+        param columns: values for any extra per-animal arrays of a subclass, e.g. cell=3
+        :return:
+        """
+        age = np.atleast_1d(np.asarray(age, dtype=np.int64))
+        weight = np.atleast_1d(np.asarray(weight, dtype=float))
+        if np.any(age < 0):
+            raise ValueError('Age of an animal cannot be negative. Please enter age greater than 0.')
+        if np.any(weight < 0):
+            raise ValueError('Weight of an animal cannot be zero or negative. Please enter weight of positive real '
+                             'number')
+
+        new_columns = {'_age': age, '_weight': weight, '_fitness': np.zeros(len(age)),
+                       '_alive': np.ones(len(age), dtype=bool)}
+        for name, values in columns.items():
+            new_columns['_' + name] = np.broadcast_to(values, age.shape)
+        self._append_columns(**new_columns)
+
+    def take(self, idx) -> dict:
+        """
+        The Take function copies the selected animals into a block that extend can add to another population.
+        param idx: index, slice or mask of the animals
+        :return: dict with one array per name in _fields
+        """
+        return {field: getattr(self, field)[:self._size][idx] for field in self._fields}
+
+    def extend(self, blocks: list):
+        """
+        The Extend function appends blocks of animals created by take. The animals keep their fitness.
+        param blocks: list of dict
+        :return:
+        """
+        start = self._size
+        self._reserve(sum(len(block['_age']) for block in blocks))
+        for block in blocks:
+            end = start + len(block['_age'])
+            for field in self._fields:
+                getattr(self, field)[start:end] = block[field]
+            start = end
+        self._size = start
+
+    def _append_columns(self, **columns):
+        """
+        The _Append_columns function appends one block of values to every per-animal array and computes the fitness
+        of the new animals.
+        param columns: one array per name in _fields
+        :return:
+        """
+        start = self._size
+        self._reserve(len(columns['_age']))
+        self._size += len(columns['_age'])
+        for field in self._fields:
+            getattr(self, field)[start:self._size] = columns[field]
+        self.update_fitness(slice(start, self._size))
+
+    def _reserve(self, extra: int):
+        """
+        The _Reserve function makes room for extra more animals, at least doubling the capacity when it grows.
+        param extra: int
+        :return:
+        """
+        needed = self._size + extra
+        if needed > self.capacity:
+            self._resize(max(needed, 2 * self.capacity, self.min_capacity))
+
+    def _resize(self, capacity: int):
+        """
+        The _Resize function moves the animals into arrays of the given capacity.
+        param capacity: int, at least the number of animals
+        :return:
+        """
+        for field in self._fields:
+            old = getattr(self, field)
+            new = np.empty(capacity, dtype=old.dtype)
+            new[:self._size] = old[:self._size]
+            setattr(self, field, new)
+
+    def update_fitness(self, idx=slice(None)):
+        """
+        The Update_fitness function recalculates phi for the selected animals.
+        param idx: index, slice or mask of the animals to update
+        :return:
+        """
+        self.fitness[idx] = self.species.fitness_batch(self.age[idx], self.weight[idx])
+
+    def reorder(self, order):
+        """
+        The Reorder function permutes the animals, e.g. to sort them by fitness.
+        param order: array of indices
+        :return:
+        """
+        for field in self._fields:
+            values = getattr(self, field)
+            values[:self._size] = values[:self._size][order]
+
+    def sort_by_fitness(self, descending=False):
+        """
+        The Sort_by_fitness function orders the animals by fitness.
+        param descending: bool
+        :return:
+        """
+        order = np.argsort(self.fitness, kind='stable')
+        if descending:
+            order = order[::-1]
+        self.reorder(order)
+
+    def remove_dead(self):
+        """
+        The Remove_dead function drops all animals whose alive flag is False in a single compaction.
+        :return: int, number of animals removed
+        """
+        keep = self.alive.copy()
+        removed = self._size - int(np.count_nonzero(keep))
+        if removed:
+            for field in self._fields:
+                values = getattr(self, field)
+                values[:self._size - removed] = values[:self._size][keep]
+            self._size -= removed
+            if self.capacity > self.min_capacity and self.fragmentation > self.max_fragmentation:
+                self._resize(max(2 * self._size, self.min_capacity))
+        return removed
+
+    def aging(self, rng=None):
+        """
+        The Aging function advances the whole population by one year in a single batch: age increases by 1, weight is
+        reduced by eta * weight, fitness is recomputed and every animal dies with probability omega * (1 - phi).
+        The dead are removed in one compaction.
+        param rng: numpy Generator used for the death draw
+        :return: int, number of animals that died
+        """
+        rng = default_rng if rng is None else rng
+        params = self.species.compiled_params()
+        age = self.age
+        weight = self.weight
+        age += 1
+        weight *= params.survival
+        self.update_fitness()
+        self.alive[:] = (weight > 0) & (rng.random(self._size) >= params.omega * (1 - self.fitness))
+        return self.remove_dead()
+
+    def procreation(self, no_of_animals, rng=None) -> int:
+        """
+        The Procreation function draws the birth of every animal in a single batch. The weight of a newborn is drawn
+        from a normal distribution with mean w_birth and deviation sigma_birth. An animal weighing at least
+        zeta * (w_birth + sigma_birth) and at least xi times the weight of its newborn gives birth with probability
+        min(1, gamma * phi * (N - 1)) and loses xi times the newborn's weight. Newborns have age 0, are appended
+        after all other animals and copy the extra columns of their parent, e.g. the cell.
+        param no_of_animals: int or numpy array, N, the number of animals of the species in the cell of every animal
+        param rng: numpy Generator used for the draws
+        :return: int, number of newborns
+        """
+        rng = default_rng if rng is None else rng
+        if self._size == 0:
+            return 0
+        params = self.species.compiled_params()
+        draws = rng.random(self._size)
+        child_weight = rng.normal(params.w_birth, params.sigma_birth, self._size)
+        weight = self.weight
+        after_birth_weight = weight - params.xi * child_weight
+        birth = (child_weight > 0) & (weight >= child_weight) & (weight >= params.min_birth_weight) & \
+            (after_birth_weight >= 0) & (draws < np.minimum(1, params.gamma * self.fitness * (no_of_animals - 1)))
+
+        newborns = int(np.count_nonzero(birth))
+        if newborns:
+            weight[birth] = after_birth_weight[birth]
+            self.update_fitness(birth)
+            block = self.take(birth)
+            block.update(_age=np.zeros(newborns, dtype=np.int64), _weight=child_weight[birth],
+                         _alive=np.ones(newborns, dtype=bool))
+            self._append_columns(**block)
+        return newborns
+
+    def draw_migrants(self, no_of_directions: int, rng=None) -> np.ndarray:
+        """
+        The Draw_migrants function decides for every animal at once whether it migrates, with probability mu * phi,
+        and in which of the no_of_directions directions. Both follow from one draw u per animal: it migrates if
+        u < mu * phi, and u / (mu * phi) is then uniform on [0, 1) and picks the direction. Every animal takes exactly
+        one number from rng.
+        param no_of_directions: int
+        param rng: numpy Generator used for the draws
+        :return: numpy array with the chosen direction of every animal, -1 for animals that stay
+        """
+        rng = default_rng if rng is None else rng
+        direction = np.full(self._size, -1)
+        probability = self.species.compiled_params().mu * self.fitness
+        draws = rng.random(self._size)
+        move = draws < probability
+        choice = (draws[move] / probability[move] * no_of_directions).astype(int)
+        direction[move] = np.minimum(choice, no_of_directions - 1)
+        return direction
+
+    def clear(self):
+        """
+        The Clear function removes all animals from the population.
+        :return:
+        """
+        self._size = 0
+
+    def to_dicts(self) -> list:
+        """
+        The To_dicts function exports the population as a list of animal dictionaries.
+        :return: list
+        """
+        return [{'age': int(age), 'weight': round(float(weight), 4), 'fitness': round(float(phi), 4)}
+                for age, weight, phi in zip(self.age, self.weight, self.fitness)]
+
+
+def pool_stats(populations) -> dict:
+    """
+    The Pool_stats function sums the number of animals and the capacity of populations.
+    param populations: iterable of Population, or of dicts returned by pool_stats
+    :return: dict with animals, capacity and fragmentation, the fraction of the capacity not in use
+    """
+    animals = capacity = 0
+    for population in populations:
+        if isinstance(population, dict):
+            animals += population['animals']
+            capacity += population['capacity']
+        else:
+            animals += len(population)
+            capacity += population.capacity
+    return {'animals': animals, 'capacity': capacity, 'fragmentation': 1 - animals / capacity if capacity else 0.0}
+
+
+def load_populations(populations: list, counts, **columns):
+    """
+    The Load_populations function replaces the animals of many populations at once, e.g. of all cells of a
+    checkpoint. The arrays hold the animals of one population after another; every population gets its slice of
+    them without copying. The caller must hand over arrays that nothing else writes to, see Island.import_state.
+    param populations: list of Population, None for a population that is skipped
+    param counts: numpy array with the number of animals of every population
+    param columns: one array per name in _fields without the leading underscore, except alive
+    :return:
+    """
+    fields = Population._fields
+    columns['alive'] = np.ones(len(columns['age']), dtype=bool)
+    bounds = np.cumsum(counts)[:-1]
+    slices = [np.split(columns[field[1:]], bounds) for field in fields]
+    for population, size, *arrays in zip(populations, counts.tolist(), *slices):
+        if population is not None:
+            for field, array in zip(fields, arrays):
+                setattr(population, field, array)
+            population._size = size
+
+
+def _hunt_cell(herbs: Population, carns: Population, prey: int, prey_end: int, hunter: int, hunter_end: int,
+               kills_needed: float, params, rng) -> int:
+    """
+    The _Hunt_cell function runs hunt for a single cell with the same kill rule. Instead of one draw per herbivore, a
+    carnivore skips ahead by a geometric number of herbivores at its highest kill probability, that of the weakest
+    herbivore still alive, and kills the herbivore it lands on with the ratio of its kill probability to the highest
+    one. This gives every herbivore the same chance to be killed, but a carnivore only needs a few draws to eat F.
+    :return: int, number of herbivores eaten
+    """
+    herb_fitness = herbs.fitness[prey:prey_end].tolist()
+    herb_weight = herbs.weight[prey:prey_end].tolist()
+    alive = herbs.alive[prey:prey_end].tolist()
+    carn_fitness = carns.fitness[hunter:hunter_end].tolist()
+    stops = np.searchsorted(herbs.fitness[prey:prey_end], carn_fitness, side='left').tolist()
+    max_food, delta_phi_max = params.F, params.DeltaPhiMax
+    meals = [0.0] * len(carn_fitness)
+    # Every try takes two draws, one for the skip and one for the kill.
+    chunk = 2 * min(len(carn_fitness) * (int(kills_needed) + 4), len(alive) + 16)
+    draws, next_draw = [], 0
+    cursor, eaten = 0, 0
+
+    for idx, phi in enumerate(carn_fitness):
+        while cursor < len(alive) and not alive[cursor]:
+            cursor += 1
+        if cursor == len(alive):
+            break
+        stop = stops[idx]
+        if stop <= cursor:
+            continue
+        most_likely = min((phi - herb_fitness[cursor]) / delta_phi_max, 1.0)
+        log_miss = math.log1p(-most_likely) if most_likely < 1.0 else 0.0
+        position, weight_eaten = cursor, 0.0
+        while True:
+            if next_draw + 2 > len(draws):
+                draws, next_draw = rng.random(chunk).tolist(), 0
+            skip_draw, kill_draw = draws[next_draw], draws[next_draw + 1]
+            next_draw += 2
+            if log_miss:
+                position += int(math.log(1.0 - skip_draw) / log_miss)
+            if position >= stop:
+                break
+            if alive[position] and kill_draw * most_likely < (phi - herb_fitness[position]) / delta_phi_max:
+                alive[position] = False
+                eaten += 1
+                meals[idx] += min(herb_weight[position], max_food - weight_eaten)
+                weight_eaten += herb_weight[position]
+                if weight_eaten >= max_food:
+                    break
+            position += 1
+
+    herbs.alive[prey:prey_end] = alive
+    carns.weight[hunter:hunter_end] += params.beta * np.array(meals)
+    return eaten
+
+
+def hunt(herbs: Population, carns: Population, prey_start, prey_end, hunter_start, hunter_end, rng=None) -> int:
+    """
+    The Hunt function lets the carnivores of one or more cells kill and eat herbivores. In every cell the carnivores
+    hunt one after another, in the order they are stored. Each one tries the herbivores still alive from the weakest
+    up until it has eaten F, and kills a herbivore of fitness phi_prey with probability
+    (phi - phi_prey) / DeltaPhiMax, clipped to 1, where phi is its fitness before hunting. As herbivores at least as
+    fit as the carnivore cannot be killed, it only tries the weaker ones.
+    The herbivores of cell i must be stored between prey_start[i] and prey_end[i] in ascending order of fitness, its
+    carnivores between hunter_start[i] and hunter_end[i]. The herbivores of the cells follow one another, from
+    prey_start[0] on; herbivores outside the cells are left alone. Each step lets the current carnivore of every
+    cell try a window of herbivores, with one batch of kill draws for all of them. The window is sized from the
+    number of tries a carnivore needs on average to eat F and doubles while it is still hungry, so a carnivore only
+    draws for about the herbivores it actually tries. A cursor per cell skips the herbivores already eaten at the
+    front. When only one cell hunts, _hunt_cell is used instead, which skips the herbivores a carnivore would fail
+    to kill.
+    Eaten herbivores are marked as dead but not removed.
+    param herbs: Population of herbivores
+    param carns: Population of carnivores
+    param prey_start: numpy array of int
+    param prey_end: numpy array of int
+    param hunter_start: numpy array of int
+    param hunter_end: numpy array of int
+    param rng: numpy Generator used for the kill draws
+    :return: int, number of herbivores eaten
+    """
+    rng = default_rng if rng is None else rng
+    params = carns.species.compiled_params()
+    prey = np.array(prey_start, dtype=np.int64)
+    prey_end = np.asarray(prey_end)
+    hunter = np.array(hunter_start, dtype=np.int64)
+    hunter_end = np.asarray(hunter_end)
+    # Fitness lies in [0, 1], so 2 * cell + fitness increases along the herbivores of all cells.
+    first_prey = int(prey[0]) if len(prey) else 0
+    cells = slice(first_prey, first_prey + int((prey_end - prey).sum()))
+    key = 2.0 * np.repeat(np.arange(len(prey)), prey_end - prey) + herbs.fitness[cells]
+    herb_fitness, herb_weight, herb_alive = herbs.fitness, herbs.weight, herbs.alive
+    # Number of kills of average weight a carnivore needs to eat F.
+    kills_needed = params.F / max(float(herb_weight[cells].mean()) if len(key) else 1.0, 1e-9)
+    # For the carnivore hunting in every cell: the next herbivore it tries, the weight of the herbivores it has eaten
+    # and how many herbivores it tries in the next step, 0 before it starts.
+    position = prey.copy()
+    eaten_weight = np.zeros(len(prey))
+    window = np.zeros(len(prey), dtype=np.int64)
+    eaten = 0
+
+    active = np.flatnonzero((prey < prey_end) & (hunter < hunter_end))
+    if active.size == 1:
+        cell = int(active[0])
+        eaten = _hunt_cell(herbs, carns, prey[cell], prey_end[cell], hunter[cell], hunter_end[cell], kills_needed,
+                           params, rng)
+        active = active[:0]
+    while active.size:
+        hunters = hunter[active]
+        phi = carns.fitness[hunters]
+        first = position[active]
+        stop = np.maximum(first_prey + np.searchsorted(key, 2.0 * active + phi, side='left'), first)
+
+        # A carnivore starts with as many herbivores as it needs to try to eat F if it killed every one with the
+        # probability of the weakest; the window doubles every step it is still hungry.
+        starting = window[active] == 0
+        if starting.any():
+            probability = (phi[starting] - herb_fitness[first[starting]]) / params.DeltaPhiMax
+            window[active[starting]] = np.ceil(kills_needed / np.clip(probability, 0.01, 1)).astype(np.int64) + 1
+        end = np.minimum(stop, first + window[active])
+
+        # The herbivores of the window still alive, owned by the hunter's position in active.
+        lengths = end - first
+        owner = np.repeat(np.arange(active.size), lengths)
+        candidates = np.arange(len(owner)) - np.repeat(np.cumsum(lengths) - lengths - first, lengths)
+        keep = herb_alive[candidates]
+        candidates, owner = candidates[keep], owner[keep]
+
+        kill = rng.random(len(candidates)) < (phi[owner] - herb_fitness[candidates]) / params.DeltaPhiMax
+        killed, killer = candidates[kill], owner[kill]
+        # A hunter eats its kills in order until it is full; it stops hunting before any later kill.
+        weight = herb_weight[killed]
+        total = np.cumsum(weight)
+        group_start = np.searchsorted(killer, killer, side='left')
+        before = total - weight - (total[group_start] - weight[group_start]) + eaten_weight[active][killer]
+        eat = before < params.F
+        food = np.minimum(weight[eat], params.F - before[eat])
+        carns.weight[hunters] += params.beta * np.bincount(killer[eat], weights=food, minlength=active.size)
+        eaten_weight[active] += np.bincount(killer[eat], weights=weight[eat], minlength=active.size)
+        herb_alive[killed[eat]] = False
+        eaten += int(np.count_nonzero(eat))
+
+        # Herbivores before the cursor of a cell are all dead. A window starting at the cursor moves it to the first
+        # herbivore of the window still alive, or to the end of the window.
+        cursor = prey[active]
+        at_cursor = first == cursor
+        left = herb_alive[candidates]
+        candidates, owner = candidates[left], owner[left]
+        first_survivor = np.ones(len(owner), dtype=bool)
+        first_survivor[1:] = owner[1:] != owner[:-1]
+        cursor[at_cursor] = end[at_cursor]
+        survivor_owner = owner[first_survivor]
+        moved = at_cursor[survivor_owner]
+        cursor[survivor_owner[moved]] = candidates[first_survivor][moved]
+        prey[active] = cursor
+
+        # A carnivore that is full or has tried all weaker herbivores hands over to the next one of its cell.
+        done = (eaten_weight[active] >= params.F) | (end >= stop)
+        hungry = active[~done]
+        position[hungry] = end[~done]
+        window[hungry] *= 2
+        finished = active[done]
+        hunter[finished] += 1
+        position[finished] = prey[finished]
+        eaten_weight[finished] = 0
+        window[finished] = 0
+        active = active[(prey[active] < prey_end[active]) & (hunter[active] < hunter_end[active])]
+
+    carns.update_fitness()
+    return eaten
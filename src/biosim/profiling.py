@@ -0,0 +1,88 @@
+import time
+
+# Columns of the per-year profile records, with the time of every phase in microseconds. The time spent writing the
+# log is only part of the totals, as a year's record is written to the log before that time is known.
+profile_phases = ('replant', 'feeding', 'procreation', 'migration', 'aging', 'render')
+profile_columns = ('Year', 'Births', 'Deaths', 'Population') + tuple(phase + '_us' for phase in profile_phases)
+
+
+class PhaseStats:
+    """
+    The PhaseStats class records wall time, number of calls and number of animals processed per phase of the annual
+    cycle, and births, deaths and population per year. The islands only fill it when profiling is enabled, otherwise
+    their profile is None and the phases run without any bookkeeping.
+    """
+    clock = staticmethod(time.perf_counter)
+
+    def __init__(self):
+        self.timings = {}
+        self.calls = {}
+        self.animals = {}
+        self.births = 0
+        self.deaths = 0
+        self.peak_population = 0
+        # One dict per finished year, see end_year.
+        self.years = []
+        self._year_timings = {}
+
+    def add(self, phase: str, seconds: float, animals=0):
+        """
+        The Add function records one call of a phase.
+        param phase: str
+        param seconds: float, wall time of the call
+        param animals: int, number of animals processed
+        :return:
+        """
+        self.timings[phase] = self.timings.get(phase, 0.0) + seconds
+        self.calls[phase] = self.calls.get(phase, 0) + 1
+        self.animals[phase] = self.animals.get(phase, 0) + animals
+        self._year_timings[phase] = self._year_timings.get(phase, 0.0) + seconds
+
+    def merge(self, other):
+        """
+        The Merge function adds the records of another part of the island, e.g. a tile.
+        param other: PhaseStats
+        :return:
+        """
+        for phase, seconds in other.timings.items():
+            self.timings[phase] = self.timings.get(phase, 0.0) + seconds
+            self.calls[phase] = self.calls.get(phase, 0) + other.calls[phase]
+            self.animals[phase] = self.animals.get(phase, 0) + other.animals[phase]
+        for phase, seconds in other._year_timings.items():
+            self._year_timings[phase] = self._year_timings.get(phase, 0.0) + seconds
+        self.births += other.births
+        self.deaths += other.deaths
+
+    def end_year(self, year: int, population: int):
+        """
+        The End_year function stores the births, deaths and phase times of a year and starts counting the next year.
+        param year: int
+        param population: int, number of animals at the end of the year
+        :return:
+        """
+        self.peak_population = max(self.peak_population, population)
+        self.years.append({'year': year, 'births': self.births, 'deaths': self.deaths, 'population': population,
+                           'timings': self._year_timings})
+        self.births = 0
+        self.deaths = 0
+        self._year_timings = {}
+
+    def record(self, year_record: dict) -> tuple:
+        """
+        The Record function converts an entry of years into a row of integers with the profile_columns.
+        param year_record: dict
+        :return: tuple
+        """
+        return (year_record['year'], year_record['births'], year_record['deaths'], year_record['population']) + \
+            tuple(int(round(year_record['timings'].get(phase, 0.0) * 1e6)) for phase in profile_phases)
+
+    def summary(self) -> dict:
+        """
+        The Summary function returns total time, calls and animals per phase, and births, deaths and peak population.
+        :return: dict
+        """
+        return {'phases': {phase: {'seconds': self.timings[phase], 'calls': self.calls[phase],
+                                   'animals': self.animals[phase]} for phase in self.timings},
+                'births': sum(year['births'] for year in self.years),
+                'deaths': sum(year['deaths'] for year in self.years),
+                'peak_population': self.peak_population}
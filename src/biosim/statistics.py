@@ -0,0 +1,230 @@
+import numpy as np
+
+# Histogram specification used for properties missing from the hist_specs given to BioSim.
+default_hist_specs = {'age': {'max': 60, 'delta': 2},
+                      'weight': {'max': 80, 'delta': 2},
+                      'fitness': {'max': 1.0, 'delta': 0.05}}
+
+
+class RunningStats:
+    """
+    The RunningStats class keeps count, mean and variance of a stream of values that arrives in batches, without
+    storing the values.
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.mean = 0.0
+        self._m2 = 0.0
+
+    @property
+    def variance(self) -> float:
+        """Population variance of all values added so far."""
+        return self._m2 / self.count if self.count else 0.0
+
+    def add(self, values):
+        """
+        The Add function merges a batch of values into the statistics.
+        param values: numpy array
+        :return:
+        """
+        if len(values) == 0:
+            return
+        batch_mean = float(np.mean(values))
+        self._merge(len(values), batch_mean, float(np.sum((values - batch_mean) ** 2)))
+
+    def merge(self, other):
+        """
+        The Merge function adds the values summarised by another RunningStats.
+        param other: RunningStats
+        :return:
+        """
+        if other.count:
+            self._merge(other.count, other.mean, other._m2)
+
+    def _merge(self, count: int, mean: float, m2: float):
+        total = self.count + count
+        delta = mean - self.mean
+        self.mean += delta * count / total
+        self._m2 += m2 + delta ** 2 * self.count * count / total
+        self.count = total
+
+    def reset(self):
+        """
+        The Reset function forgets all values.
+        :return:
+        """
+        self.count = 0
+        self.mean = 0.0
+        self._m2 = 0.0
+
+
+class Histogram:
+    """
+    The Histogram class counts values in fixed bins of width delta from 0 to max. Values above max are not counted.
+    """
+
+    def __init__(self, max_value: float, delta: float):
+        self.max_value = max_value
+        self.delta = delta
+        self.counts = np.zeros(int(round(max_value / delta)), dtype=np.int64)
+
+    @property
+    def edges(self) -> np.ndarray:
+        """Edges of the bins."""
+        return np.linspace(0, self.max_value, len(self.counts) + 1)
+
+    def add(self, values):
+        """
+        The Add function counts a batch of values.
+        param values: numpy array
+        :return:
+        """
+        values = np.asarray(values)
+        values = values[(values >= 0) & (values <= self.max_value)]
+        bins = np.minimum((values / self.delta).astype(np.int64), len(self.counts) - 1)
+        self.counts += np.bincount(bins, minlength=len(self.counts))
+
+    def merge(self, other):
+        """
+        The Merge function adds the counts of another histogram with the same bins.
+        param other: Histogram
+        :return:
+        """
+        self.counts += other.counts
+
+    def reset(self):
+        """
+        The Reset function sets all counts to zero.
+        :return:
+        """
+        self.counts[:] = 0
+
+
+class PopulationStatistics:
+    """
+    The PopulationStatistics class summarises the animals alive at the end of a year. Histograms of age, weight and
+    fitness, counts, means and variances per species and counts, mean and variance of weight per cell are updated from
+    each cell's aging phase. Cells are added to a small pending batch that is merged into the statistics once it
+    holds flush_size animals, so memory use depends only on the number of bins and cells, not on the number of
+    animals or years. If the shape of the map is given, the number of animals of every cell is also kept in one grid
+    per species, indexed as grids[species][y - 1, x - 1].
+    """
+    species = ('Herbivore', 'Carnivore')
+    properties = ('age', 'weight', 'fitness')
+    flush_size = 2 ** 16
+
+    def __init__(self, hist_specs=None, shape=None):
+        """
+        The Initialize function creates empty statistics.
+        param hist_specs: dict mapping property to {'max': float, 'delta': float}
+        param shape: tuple, the number of rows and columns of the map, if None no count grids are kept
+        """
+        self._pending = {species: [] for species in self.species}
+        self._pending_size = 0
+        self.hist_specs = dict(default_hist_specs, **(hist_specs or {}))
+        self.histograms = {species: {prop: Histogram(self.hist_specs[prop]['max'], self.hist_specs[prop]['delta'])
+                                     for prop in self.properties} for species in self.species}
+        self.moments = {species: {prop: RunningStats() for prop in self.properties} for species in self.species}
+        # Maps coordinate to {species: (count, mean weight, weight variance)}.
+        self.cells = {}
+        self.shape = shape
+        self.grids = {species: np.zeros(shape, dtype=np.int64) for species in self.species} if shape else None
+
+    def add(self, species: str, age, weight, fitness, coord=None):
+        """
+        The Add function adds the surviving animals of one species in one cell.
+        param species: str
+        param age: numpy array
+        param weight: numpy array
+        param fitness: numpy array
+        param coord: tuple, the coordinate of the cell
+        :return:
+        """
+        self._pending[species].append((coord, age, weight, fitness))
+        self._pending_size += len(age)
+        if self._pending_size >= self.flush_size:
+            self.flush()
+
+    def flush(self):
+        """
+        The Flush function merges the pending cells into the statistics.
+        :return:
+        """
+        for species, pending in self._pending.items():
+            if not pending:
+                continue
+            coords, ages, weights, fitnesses = zip(*pending)
+            weight = np.concatenate(weights)
+            for prop, values in zip(self.properties, (np.concatenate(ages), weight, np.concatenate(fitnesses))):
+                self.histograms[species][prop].add(values)
+                self.moments[species][prop].add(values)
+
+            cells = [idx for idx, coord in enumerate(coords) if coord is not None]
+            if cells:
+                count = np.array([len(weights[idx]) for idx in cells])
+                cell_idx = np.repeat(np.arange(len(pending)), [len(values) for values in weights])
+                keep = np.isin(cell_idx, cells)
+                occupied = np.maximum(count, 1)
+                total = np.bincount(cell_idx[keep], weights=weight[keep], minlength=len(pending))[cells]
+                squares = np.bincount(cell_idx[keep], weights=weight[keep] ** 2, minlength=len(pending))[cells]
+                mean = total / occupied
+                self.add_cells(species, [coords[idx] for idx in cells], count, mean,
+                               np.maximum(squares / occupied - mean ** 2, 0.0))
+            pending.clear()
+        self._pending_size = 0
+
+    def add_cells(self, species: str, coords: list, count, mean, variance):
+        """
+        The Add_cells function stores count, mean and variance of weight of one species for many cells at once.
+        param species: str
+        param coords: list of tuple
+        param count: numpy array
+        param mean: numpy array
+        param variance: numpy array
+        :return:
+        """
+        for coord, cell_count, cell_mean, cell_variance in zip(coords, count.tolist(), mean.tolist(),
+                                                                variance.tolist()):
+            self.cells.setdefault(coord, {})[species] = (cell_count, cell_mean, cell_variance)
+        if self.grids is not None and len(coords):
+            x_ax, y_ax = np.asarray(coords).T
+            self.grids[species][y_ax - 1, x_ax - 1] = count
+
+    def merge(self, other):
+        """
+        The Merge function adds the statistics of another part of the island.
+        param other: PopulationStatistics
+        :return:
+        """
+        self.flush()
+        other.flush()
+        for species in self.species:
+            for prop in self.properties:
+                self.histograms[species][prop].merge(other.histograms[species][prop])
+                self.moments[species][prop].merge(other.moments[species][prop])
+            if self.grids is not None:
+                self.grids[species] += other.grids[species]
+        self.cells.update(other.cells)
+
+    def reset(self):
+        """
+        The Reset function empties the statistics before a new year.
+        :return:
+        """
+        for pending in self._pending.values():
+            pending.clear()
+        self._pending_size = 0
+        for species in self.species:
+            for prop in self.properties:
+                self.histograms[species][prop].reset()
+                self.moments[species][prop].reset()
+            if self.grids is not None:
+                self.grids[species][:] = 0
+        self.cells.clear()
+
+    @property
+    def num_animals_per_species(self) -> dict:
+        """Number of animals per species, as dictionary."""
+        self.flush()
+        return {species: self.moments[species]['age'].count for species in self.species}
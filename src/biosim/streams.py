@@ -0,0 +1,67 @@
+import numpy as np
+
+# Annual phases that draw random numbers. Each phase draws from its own stream.
+phases = ('feeding', 'procreation', 'migration', 'aging')
+_low_bits = 2 ** 64 - 1
+
+
+def spawn_streams(seed, *key) -> dict:
+    """
+    The Spawn_streams function derives one independent random number generator per phase from the simulation seed.
+    Streams with different keys, e.g. the coordinates of two cells, are independent of each other, so the results
+    do not depend on the order in which cells or phases draw their numbers.
+    param seed: int
+    param key: non-negative ints identifying the owner of the streams
+    :return: dict mapping phase name to numpy Generator
+    """
+    return {phase: np.random.default_rng(np.random.SeedSequence(seed, spawn_key=(*key, idx)))
+            for idx, phase in enumerate(phases)}
+
+
+# Generators restored from a packed state are created from this seed first; their state is replaced at once, so
+# any seed will do, and a SeedSequence made once avoids hashing a new seed for every generator.
+_restore_seed = np.random.SeedSequence(0)
+
+
+def restore_streams(packed) -> dict:
+    """
+    The Restore_streams function creates one generator per phase in the states stored by pack_streams.
+    param packed: list or numpy array with one row of six uint64 values per phase
+    :return: dict mapping phase name to numpy Generator
+    """
+    streams = {phase: np.random.Generator(np.random.PCG64(_restore_seed)) for phase in phases}
+    unpack_streams(streams, packed)
+    return streams
+
+
+def pack_streams(streams: dict, out=None) -> list:
+    """
+    The Pack_streams function stores the state of the PCG64 generators of all phases as integers.
+    param streams: dict mapping phase name to numpy Generator
+    param out: list to extend with the six values of every phase, one after another, or None
+    :return: list with one row of six uint64 values per phase, ready to be converted into a numpy array, or out
+    """
+    packed = []
+    for phase in phases:
+        state = streams[phase].bit_generator.state
+        row = (state['state']['state'] & _low_bits, state['state']['state'] >> 64,
+               state['state']['inc'] & _low_bits, state['state']['inc'] >> 64, state['has_uint32'], state['uinteger'])
+        if out is None:
+            packed.append(row)
+        else:
+            out.extend(row)
+    return packed if out is None else out
+
+
+def unpack_streams(streams: dict, packed):
+    """
+    The Unpack_streams function restores the state of the generators of all phases from the rows made by
+    pack_streams.
+    param streams: dict mapping phase name to numpy Generator
+    param packed: list or numpy array with one row of six uint64 values per phase
+    :return:
+    """
+    for phase, row in zip(phases, packed.tolist() if isinstance(packed, np.ndarray) else packed):
+        streams[phase].bit_generator.state = {'bit_generator': 'PCG64',
+                                              'state': {'state': row[0] | row[1] << 64, 'inc': row[2] | row[3] << 64},
+                                              'has_uint32': row[4], 'uinteger': row[5]}
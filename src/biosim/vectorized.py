@@ -0,0 +1,349 @@
+from src.biosim.animals import Herbivore, Carnivore, animal_species
+from src.biosim.land import directions, landscapes
+from src.biosim.population import Population, _empty, hunt, pool_stats
+from src.biosim.profiling import PhaseStats
+from src.biosim.statistics import PopulationStatistics
+from src.biosim.streams import pack_streams, spawn_streams, unpack_streams
+import numpy as np
+
+
+class IslandPopulation(Population):
+    """
+    The IslandPopulation class stores every animal of one species on the whole island in one set of arrays, tagged
+    with the index of the cell the animal lives in.
+    """
+    _fields = Population._fields + ('_cell',)
+
+    def __init__(self, species):
+        """
+        The Initialize function creates an empty island-wide population for a species.
+        param species: Animal subclass whose params apply to this population
+        """
+        super().__init__(species)
+        self._cell = _empty[np.int64]
+
+    @property
+    def cell(self) -> np.ndarray:
+        """Index of the cell every animal lives in."""
+        return self._cell[:self._size]
+
+    def counts(self, no_of_cells: int) -> np.ndarray:
+        """
+        The Counts function returns the number of animals in every cell.
+        param no_of_cells: int
+        :return: numpy array of int
+        """
+        return np.bincount(self.cell, minlength=no_of_cells)
+
+    def segments(self, no_of_cells: int):
+        """
+        The Segments function returns the first and one-past-last index of every cell's animals. The population must
+        be ordered by cell.
+        param no_of_cells: int
+        :return: two numpy arrays of int
+        """
+        counts = self.counts(no_of_cells)
+        end = np.cumsum(counts)
+        return end - counts, end
+
+    def sort_by_cell(self, key):
+        """
+        The Sort_by_cell function groups the animals by cell and orders them by key within each cell.
+        param key: numpy array with one sort key per animal
+        :return:
+        """
+        self.reorder(np.lexsort((key, self.cell)))
+
+
+class VectorizedIsland:
+    """
+    The VectorizedIsland class simulates all cells of the island at once. Every annual phase runs as grouped array
+    operations over the island-wide population arrays instead of looping over Land cells.
+    """
+
+    def __init__(self, land_map: dict, seed=1):
+        """
+        The Initialize function creates the cell index and grass array of the habitable coordinates of the island.
+        param land_map: dict
+        param seed: int, every phase draws from its own random number stream derived from seed
+        """
+        self.land_map = land_map
+        self.coords = sorted(land_map)
+        self.cell_idx = {coord: idx for idx, coord in enumerate(self.coords)}
+        self.letters = np.array([land_map[coord] for coord in self.coords], dtype='U1')
+        self.f_max = np.zeros(len(self.coords))
+        for code, land in landscapes.items():
+            self.f_max[self.letters == code] = land.f_max
+        self.grass = self.f_max.copy()
+        # Index of the cell north, south, east and west of every cell; a cell's own index stands in for water. The
+        # table is looked up in a grid of cell indices with a border of -1, one row and column wider on every side.
+        x_ax, y_ax = np.array(self.coords, dtype=np.int64).reshape(-1, 2).T
+        own = np.arange(len(self.coords))
+        grid = np.full((y_ax.max(initial=0) + 2, x_ax.max(initial=0) + 2), -1, dtype=np.int64)
+        grid[y_ax, x_ax] = own
+        self.neighbour_table = np.stack([grid[y_ax + dy, x_ax + dx] for dx, dy in directions], axis=1)
+        self.neighbour_table = np.where(self.neighbour_table < 0, own[:, None], self.neighbour_table)
+        self.herb_pop = IslandPopulation(Herbivore)
+        self.carn_pop = IslandPopulation(Carnivore)
+        self.streams = spawn_streams(seed)
+        # PhaseStats filled by the annual cycle when profiling is enabled.
+        self.profile = None
+
+    def __len__(self):
+        return len(self.coords)
+
+    def insert_pop(self, pop: list):
+        """
+        The Insert_pop function inserts population of animals to desired coordinate on the island.
+        param pop: list
+        :return:
+        """
+        new_animals = {'Herbivore': ([], [], []), 'Carnivore': ([], [], [])}
+        for item in pop:
+            if item['loc'] not in self.cell_idx:
+                raise ValueError('Location {} is not a habitable cell of the island.'.format(item['loc']))
+            cell = self.cell_idx[item['loc']]
+            for animal in item['pop']:
+                ages, weights, cells = new_animals[animal['species']]
+                ages.append(animal['age'])
+                weights.append(animal['weight'])
+                cells.append(cell)
+        # Append all animals of a species at once, so loading scales linearly with the number of entries.
+        for species, island_pop in (('Herbivore', self.herb_pop), ('Carnivore', self.carn_pop)):
+            ages, weights, cells = new_animals[species]
+            if ages:
+                island_pop.append(ages, weights, cell=np.array(cells, dtype=np.int64))
+        # Keep the animals ordered by cell, so the draws each animal gets do not depend on the order of insertion.
+        for island_pop in (self.herb_pop, self.carn_pop):
+            island_pop.reorder(np.argsort(island_pop.cell, kind='stable'))
+
+    def set_animal_parameters(self, species: str, params: dict):
+        """
+        The Set_animal_parameters function updates the parameters of a species, see Animal.set_params.
+        param species: str
+        param params: dict
+        :return:
+        """
+        animal_species[species].set_params(params)
+
+    def set_landscape_parameters(self, landscape: str, params: dict):
+        """
+        The Set_landscape_parameters function changes the max vegetation of all cells of a landscape at once. The new
+        value takes effect at the next replant.
+        param landscape: str, landscape code letter
+        param params: dict, e.g. {'f_max': 700}
+        :return:
+        """
+        if 'f_max' in params:
+            self.f_max[self.letters == landscape] = params['f_max']
+
+    def _generator(self, phase: str, island_pop: IslandPopulation):
+        """
+        The _Generator function returns the random number generator the animals of a population draw from in a phase.
+        param phase: str
+        param island_pop: IslandPopulation
+        :return: numpy Generator
+        """
+        return self.streams[phase]
+
+    def replant(self):
+        """
+        The Replant function resets the grass of every cell to its max vegetation.
+        :return:
+        """
+        self.grass[:] = self.f_max
+
+    def feeding(self):
+        """
+        The Feeding function lets the herbivores of all cells graze, followed by the carnivores hunting.
+        :return:
+        """
+        self._graze()
+        self._hunt()
+
+    def _graze(self):
+        """
+        The _Graze function feeds the herbivores of every cell in descending order of fitness. The n-th herbivore of a
+        cell finds the grass left after the n - 1 fitter ones each ate F, so its intake follows from its rank alone.
+        :return:
+        """
+        herbs = self.herb_pop
+        if len(herbs) == 0:
+            return
+        params = herbs.species.compiled_params()
+        herbs.sort_by_cell(-herbs.fitness)
+        start, _ = herbs.segments(len(self))
+        rank = np.arange(len(herbs)) - start[herbs.cell]
+        intake = np.clip(self.grass[herbs.cell] - rank * params.F, 0, params.F)
+        herbs.weight[:] += params.beta * intake
+        herbs.update_fitness()
+        self.grass -= np.bincount(herbs.cell, weights=intake, minlength=len(self))
+
+    def _hunt(self):
+        """
+        The _Hunt function lets the carnivores of every cell, in random order, kill and eat the herbivores of the
+        cell, see population.hunt.
+        :return:
+        """
+        herbs = self.herb_pop
+        carns = self.carn_pop
+        if len(herbs) == 0 or len(carns) == 0:
+            return
+        herbs.sort_by_cell(herbs.fitness)
+        carns.sort_by_cell(self._generator('feeding', carns).random(len(carns)))
+        prey, prey_end = herbs.segments(len(self))
+        hunter, hunter_end = carns.segments(len(self))
+        hunt(herbs, carns, prey, prey_end, hunter, hunter_end, self.streams['feeding'])
+        herbs.remove_dead()
+
+    def procreation(self):
+        """
+        The Procreation function draws the birth of every animal on the island at once and adds the newborns to the
+        cells of their parents.
+        :return:
+        """
+        for island_pop in (self.herb_pop, self.carn_pop):
+            island_pop.procreation(island_pop.counts(len(self))[island_pop.cell],
+                                   self._generator('procreation', island_pop))
+
+    def migration(self):
+        """
+        The Migration function moves every migrating animal on the island at once by rewriting its cell index. All
+        decisions are drawn before any animal moves, so no animal migrates twice in a year.
+        :return:
+        """
+        for island_pop in (self.herb_pop, self.carn_pop):
+            direction = island_pop.draw_migrants(len(directions), self._generator('migration', island_pop))
+            moving = direction >= 0
+            island_pop.cell[moving] = self.neighbour_table[island_pop.cell[moving], direction[moving]]
+
+    def aging(self, statistics=None):
+        """
+        The Aging function ages every animal on the island and removes the dead.
+        param statistics: PopulationStatistics to fill with the surviving animals, a new one if None
+        :return: PopulationStatistics
+        """
+        statistics = PopulationStatistics() if statistics is None else statistics
+        pops = (('Herbivore', self.herb_pop), ('Carnivore', self.carn_pop))
+        for species, island_pop in pops:
+            island_pop.aging(self._generator('aging', island_pop))
+        # Only cells holding animals of any species are added, as on the serial Island.
+        counts = {species: island_pop.counts(len(self)) for species, island_pop in pops}
+        cells = np.flatnonzero(counts['Herbivore'] + counts['Carnivore'])
+        coords = [self.coords[idx] for idx in cells.tolist()]
+        for species, island_pop in pops:
+            statistics.add(species, island_pop.age, island_pop.weight, island_pop.fitness)
+            count = counts[species]
+            occupied = np.maximum(count, 1)
+            mean = np.bincount(island_pop.cell, weights=island_pop.weight, minlength=len(self)) / occupied
+            variance = np.bincount(island_pop.cell, weights=island_pop.weight ** 2, minlength=len(self)) / occupied \
+                - mean ** 2
+            statistics.add_cells(species, coords, count[cells], mean[cells], np.maximum(variance[cells], 0.0))
+        statistics.flush()
+        return statistics
+
+    def annual_cycle(self, statistics=None):
+        """
+        The Annual_cycle function runs replant, feeding, procreation, migration and aging on the whole island.
+        param statistics: PopulationStatistics to fill with the surviving animals, a new one if None
+        :return: PopulationStatistics
+        """
+        if self.profile is not None:
+            return self._profiled_annual_cycle(statistics)
+        self.replant()
+        self.feeding()
+        self.procreation()
+        self.migration()
+        return self.aging(statistics)
+
+    def _profiled_annual_cycle(self, statistics):
+        """
+        The _Profiled_annual_cycle function runs the annual cycle while recording the time of every phase and the
+        change in the number of animals.
+        """
+        changes = {}
+        for phase, args in (('replant', ()), ('feeding', ()), ('procreation', ()), ('migration', ()),
+                            ('aging', (statistics,))):
+            before = len(self.herb_pop) + len(self.carn_pop)
+            start = self.profile.clock()
+            result = getattr(self, phase)(*args)
+            self.profile.add(phase, self.profile.clock() - start, before)
+            changes[phase] = len(self.herb_pop) + len(self.carn_pop) - before
+        self.profile.births += changes['procreation']
+        self.profile.deaths -= changes['feeding'] + changes['aging']
+        return result
+
+    def enable_profile(self, enabled=True):
+        """
+        The Enable_profile function starts or stops recording phase times, births and deaths.
+        param enabled: bool
+        :return:
+        """
+        self.profile = PhaseStats() if enabled else None
+
+    def take_profile(self):
+        """
+        The Take_profile function returns the records since the last call and starts a new PhaseStats.
+        :return: PhaseStats, or None if profiling is disabled
+        """
+        profile = self.profile
+        if profile is not None:
+            self.profile = PhaseStats()
+        return profile
+
+    @property
+    def num_animals_per_species(self) -> dict:
+        """Number of animals per species on the island, as dictionary."""
+        return {'Herbivore': len(self.herb_pop), 'Carnivore': len(self.carn_pop)}
+
+    def cell_counts(self) -> dict:
+        """
+        The Cell_counts function returns the number of herbivores and carnivores of every habitable cell.
+        :return: dict mapping coordinate to (herbivores, carnivores)
+        """
+        herb_counts = self.herb_pop.counts(len(self))
+        carn_counts = self.carn_pop.counts(len(self))
+        return {coord: (int(herb_counts[idx]), int(carn_counts[idx])) for idx, coord in enumerate(self.coords)}
+
+    def pool_stats(self) -> dict:
+        """
+        The Pool_stats function reports the memory held by the island populations, see population.pool_stats.
+        :return: dict mapping species to {'animals': int, 'capacity': int, 'fragmentation': float}
+        """
+        return {'Herbivore': pool_stats([self.herb_pop]), 'Carnivore': pool_stats([self.carn_pop])}
+
+    def close(self):
+        """
+        The Close function releases the resources of the island. The island runs in this process, so there are none.
+        :return:
+        """
+
+    def export_state(self) -> dict:
+        """
+        The Export_state function collects grass, populations and random number generator states of the island into
+        flat arrays.
+        :return: dict mapping name to numpy array
+        """
+        state = {'coords': np.array(self.coords, dtype=np.int64).reshape(-1, 2),
+                 'grass': self.grass.copy(),
+                 'streams': np.array([pack_streams(self.streams)], dtype=np.uint64)}
+        for prefix, island_pop in (('herb', self.herb_pop), ('carn', self.carn_pop)):
+            for field in ('cell', 'age', 'weight', 'fitness'):
+                state[prefix + '_' + field] = getattr(island_pop, field).copy()
+        return state
+
+    def import_state(self, state: dict):
+        """
+        The Import_state function restores the island from arrays made by export_state.
+        param state: dict mapping name to numpy array
+        :return:
+        """
+        if [tuple(coord) for coord in state['coords'].tolist()] != self.coords:
+            raise ValueError('The state belongs to an island with different habitable cells.')
+        self.grass[:] = state['grass']
+        unpack_streams(self.streams, state['streams'][0])
+        for prefix, island_pop in (('herb', self.herb_pop), ('carn', self.carn_pop)):
+            island_pop.clear()
+            island_pop.extend([{'_cell': state[prefix + '_cell'], '_age': state[prefix + '_age'],
+                                '_weight': state[prefix + '_weight'], '_fitness': state[prefix + '_fitness'],
+                                '_alive': np.ones(len(state[prefix + '_age']), dtype=bool)}])
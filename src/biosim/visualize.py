@@ -1,108 +1,293 @@
-import matplotlib.pyplot as plt
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.figure import Figure
 import matplotlib.patches as mpatches
+import multiprocessing
+import numpy as np
 import os
+import queue
+
+from src.biosim.land import parse_map
+from src.biosim.statistics import PopulationStatistics
+
 
 class Visualize:
+    """
+    The Visualize class draws the island, the animal distributions, the population over time and the age, weight and
+    fitness histograms. The figure is built once on the Agg backend; every update only replaces the data of the
+    existing artists before the figure is written to file. Record and draw are separate steps, so the figure can be
+    drawn from a snapshot in another process, see FrameRenderer.
+    """
+    rgb_value = {'W': (0.0, 0.0, 1.0),
+                 'L': (0.0, 0.6, 0.0),
+                 'H': (0.5, 1.0, 0.5),
+                 'D': (1.0, 1.0, 0.5)}
+    colors = {'Herbivore': 'g', 'Carnivore': 'r'}
+    default_cmax = {'Herbivore': 50, 'Carnivore': 20}
+
+    def __init__(self, geography: str, hist_specs=None, ymax_animals=None, cmax_animals=None, img_dir=None,
+                 img_base='biosim'):
+        """
+        The Initialize function stores the settings of the figure.
+        param geography: str, the island map
+        param hist_specs: dict mapping property to {'max': float, 'delta': float}
+        param ymax_animals: y-axis limit of the population plot, adjusted automatically if None
+        param cmax_animals: dict mapping species to the color-code limit of its distribution map
+        param img_dir: str, directory for the figures
+        param img_base: str, beginning of the file names of the figures
+        """
+        self.geography = geography
+        self.hist_specs = PopulationStatistics(hist_specs).hist_specs
+        self.ymax_animals = ymax_animals
+        self.cmax_animals = dict(self.default_cmax, **(cmax_animals or {}))
+        self.img_dir = img_dir
+        self.img_base = img_base
+        self.img_number = 0
+
+        self._fig = None
+        self._years = np.zeros(0)
+        self._counts = {species: np.zeros(0) for species in self.colors}
+        self._no_of_years = 0
+        self._final_year = 0
+
+    def setup(self, final_year: int):
+        """
+        The Setup function extends the population plot up to final_year.
+        param final_year: int
+        :return:
+        """
+        self._final_year = final_year
+        if final_year > len(self._years):
+            self._resize(final_year)
+
+    def _resize(self, capacity: int):
+        capacity = max(capacity, 2 * len(self._years))
+        self._years = np.resize(self._years, capacity)
+        self._counts = {species: np.resize(counts, capacity) for species, counts in self._counts.items()}
+
+    def _build_figure(self):
+        """
+        The _Build_figure function creates the figure with all axes and artists.
+        :return:
+        """
+        geography = parse_map(self.geography)
+        rows, columns = geography.shape
+        map_rgb = np.zeros((rows, columns, 3))
+        for code, color in self.rgb_value.items():
+            map_rgb[geography == code.encode()] = color
+
+        self._fig = Figure(constrained_layout=True, figsize=(15, 15))
+        FigureCanvasAgg(self._fig)
+        self._fig.suptitle("Rossumoya Ecosystem Model", fontsize=35, fontweight="bold")
+        grid = self._fig.add_gridspec(5, 6)
+
+        # Create Island Map
+        map_ax = self._fig.add_subplot(grid[1:3, 2:4])
+        self._map_title = map_ax.set_title("", fontsize=30, fontweight="bold")
+        map_ax.imshow(map_rgb)
+        patches = [mpatches.Patch(color=self.rgb_value[code], label=label)
+                   for code, label in (('L', "Lowland"), ('H', "Highland"), ('D', "Desert"), ('W', "Water"))]
+        map_ax.legend(bbox_to_anchor=(0.5, -0.1), loc="upper center", mode="expand", ncol=2, handles=patches,
+                      fontsize=10)
+
+        # Create Herbivore and Carnivore Distribution Maps
+        self._heatmaps = {}
+        for species, position, location in (('Herbivore', grid[1:3, 0:2], "left"),
+                                            ('Carnivore', grid[1:3, 4:], "right")):
+            ax = self._fig.add_subplot(position)
+            ax.set_title("{} Distribution".format(species), fontsize=20)
+            self._heatmaps[species] = ax.imshow(np.zeros((rows, columns)), vmin=0, vmax=self.cmax_animals[species])
+            self._fig.colorbar(self._heatmaps[species], ax=ax, location=location, shrink=0.5)
+        # Label at most about 20 rows and columns of large maps.
+        x_ticks = range(0, columns, max(1, columns // 20))
+        y_ticks = range(0, rows, max(1, rows // 20))
+        for ax in (map_ax, *[heatmap.axes for heatmap in self._heatmaps.values()]):
+            ax.set_xticks(x_ticks)
+            ax.set_xticklabels([tick + 1 for tick in x_ticks])
+            ax.set_yticks(y_ticks)
+            ax.set_yticklabels([tick + 1 for tick in y_ticks])
+            ax.grid()
+
+        # Create Animal Count per year
+        self._population_ax = self._fig.add_subplot(grid[3:, 0:])
+        self._population_ax.set_title("Animal Population", fontsize=20)
+        self._lines = {species: self._population_ax.plot([], [], color=color, label=species, lw=5)[0]
+                       for species, color in self.colors.items()}
+        self._population_ax.legend()
+        self._population_ax.grid()
+        if self.ymax_animals is not None:
+            self._population_ax.set_ylim(0, self.ymax_animals)
+
+        # Create Age, Weight and Fitness Histogram
+        self._hist_axes = {}
+        self._stairs = {}
+        for prop, position in (('age', grid[0, 0:2]), ('weight', grid[0, 2:4]), ('fitness', grid[0, 4:6])):
+            ax = self._fig.add_subplot(position)
+            ax.set_title("{} Histogram".format(prop.capitalize()), fontsize=20)
+            spec = self.hist_specs[prop]
+            edges = np.linspace(0, spec['max'], int(round(spec['max'] / spec['delta'])) + 1)
+            for species, color in self.colors.items():
+                self._stairs[species, prop] = ax.stairs(np.zeros(len(edges) - 1), edges, color=color, label=species,
+                                                        lw=5)
+            ax.set_xlim(0, spec['max'])
+            ax.grid()
+            self._hist_axes[prop] = ax
+
+    def record(self, year: int, statistics) -> dict:
+        """
+        The Record function adds the animal counts of a year to the population plot and returns a snapshot with all
+        data needed to draw the figure of that year. The snapshot only holds the count grids and histogram counts
+        of the statistics, so its size does not depend on the number of animals.
+        param year: int
+        param statistics: PopulationStatistics of the year, with count grids
+        :return: dict
+        """
+        if self._no_of_years >= len(self._years):
+            self._resize(max(year, self._no_of_years + 1))
+        counts = statistics.num_animals_per_species
+        self._years[self._no_of_years] = year
+        for species in self.colors:
+            self._counts[species][self._no_of_years] = counts[species]
+        self._no_of_years += 1
+        return {'year': year,
+                'final_year': max(self._final_year, year),
+                'grids': {species: grid.copy() for species, grid in statistics.grids.items()},
+                'histograms': {(species, prop): statistics.histograms[species][prop].counts.copy()
+                               for species in self.colors for prop in statistics.properties},
+                'years': self._years[:self._no_of_years].copy(),
+                'counts': {species: counts[:self._no_of_years].copy() for species, counts in self._counts.items()}}
+
+    def draw(self, snapshot: dict):
+        """
+        The Draw function replaces the data of all artists with a snapshot made by record.
+        param snapshot: dict
+        :return:
+        """
+        if self._fig is None:
+            self._build_figure()
+        self._map_title.set_text("Island (Year: {num:03d})".format(num=snapshot['year']))
+        for species, heatmap in self._heatmaps.items():
+            heatmap.set_data(snapshot['grids'][species])
+
+        self._population_ax.set_xlim(0, snapshot['final_year'])
+        for species, line in self._lines.items():
+            line.set_data(snapshot['years'], snapshot['counts'][species])
+        if self.ymax_animals is None:
+            top = max(counts.max(initial=0) for counts in snapshot['counts'].values())
+            self._population_ax.set_ylim(0, max(top, 1) * 1.1)
+
+        for prop, ax in self._hist_axes.items():
+            top = 1
+            for species in self.colors:
+                values = snapshot['histograms'][species, prop]
+                self._stairs[species, prop].set_data(values)
+                top = max(top, values.max(initial=0))
+            ax.set_ylim(0, top * 1.1)
+
+    def update(self, year: int, statistics):
+        """
+        The Update function records a year and draws its figure in this process.
+        param year: int
+        param statistics: PopulationStatistics of the year, with count grids
+        :return:
+        """
+        self.draw(self.record(year, statistics))
+
+    def save(self, img_number=None):
+        """
+        The Save function writes the figure to {img_dir}/{img_base}_{img_number:05d}.png.
+        param img_number: int, the next consecutive number if None
+        :return:
+        """
+        img_number = self.img_number if img_number is None else img_number
+        os.makedirs(self.img_dir, exist_ok=True)
+        plotfilename = os.path.join(self.img_dir, '{}_{num:05d}.png'.format(self.img_base, num=img_number))
+        self._fig.savefig(plotfilename)
+        self.img_number = img_number + 1
+
+    @property
+    def settings(self) -> dict:
+        """Arguments to create a Visualize with the same figure settings."""
+        return {'geography': self.geography, 'hist_specs': self.hist_specs, 'ymax_animals': self.ymax_animals,
+                'cmax_animals': self.cmax_animals, 'img_dir': self.img_dir, 'img_base': self.img_base}
+
+
+def _render_worker(snapshots, settings: dict):
+    """
+    The _Render_worker function draws and saves the snapshots taken from the queue until it receives None.
+    """
+    visualize = Visualize(**settings)
+    while True:
+        item = snapshots.get()
+        if item is None:
+            break
+        img_number, snapshot = item
+        visualize.draw(snapshot)
+        visualize.save(img_number)
+
+
+class FrameRenderer:
+    """
+    The FrameRenderer class draws and saves figures in worker processes, so the simulation does not wait for savefig.
+    Snapshots are passed through a bounded queue: when the workers fall behind, submit blocks until a worker has taken
+    a snapshot, which keeps the number of snapshots in memory at most queue_size.
+    """
+
+    def __init__(self, visualize: Visualize, workers=1, queue_size=4):
+        """
+        The Initialize function starts the worker processes.
+        param visualize: Visualize whose settings the workers use
+        param workers: int
+        param queue_size: int, the maximum number of snapshots waiting to be drawn
+        """
+        self.visualize = visualize
+        self.queue = multiprocessing.Queue(maxsize=queue_size)
+        self.processes = [multiprocessing.Process(target=_render_worker, args=(self.queue, visualize.settings),
+                                                  daemon=True) for _ in range(workers)]
+        for process in self.processes:
+            process.start()
+
+    def submit(self, snapshot: dict):
+        """
+        The Submit function hands a snapshot to the workers, which save it with the next consecutive image number.
+        param snapshot: dict made by Visualize.record
+        :return:
+        """
+        if not all(process.is_alive() for process in self.processes):
+            raise RuntimeError('A frame rendering process has stopped.')
+        item = (self.visualize.img_number, snapshot)
+        self.visualize.img_number += 1
+        self._put(item)
 
-    def visualise(self):
-        # Create image directory if it does not exists
-        if os.path.isdir(self.img_dir) == False:
-            os.mkdir(self.img_dir)
-        path = self.img_dir
-
-        # If vis_years = 0 then disable graphics.
-        if self.vis_years != 0:
-            if year % self.img_years == 0 and year >= self.img_years:
-                # Create plot file name
-                plotfilename = '{}_{num:05d}.png'.format(self.img_base, num=year)
-                plotfilename = os.path.join(path, plotfilename)
-
-                rgb_value = {'W': (0.0, 0.0, 1.0),
-                             'L': (0.0, 0.6, 0.0),
-                             'H': (0.5, 1.0, 0.5),
-                             'D': (1.0, 1.0, 0.5)}
-                map_rgb = [[rgb_value[column] for column in row] for row in map.splitlines()]
-
-                fig = plt.figure(constrained_layout=True, figsize=(15, 15))
-                fig.suptitle("Rossumoya Ecosystem Model", fontsize=35, fontweight="bold")
-                fig.tight_layout(h_pad=1, w_pad=2)
-                ax = fig.add_gridspec(5, 6)
-
-                # Create Subplots
-                ax1 = fig.add_subplot(ax[0, 0:2])
-                ax1.set_title('Age Histogram', fontsize=20)
-                ax2 = fig.add_subplot(ax[0, 2:4])
-                ax2.set_title('Weight Histogram', fontsize=20)
-                ax3 = fig.add_subplot(ax[0, 4:6])
-                ax3.set_title("Fitness Histogram", fontsize=20)
-                ax4 = fig.add_subplot(ax[1:3, 2:4])
-                ax4.set_title("Island (Year: {num:03d})".format(num=year), fontsize=30, fontweight="bold")
-                ax5 = fig.add_subplot(ax[3:, 0:])
-                ax5.set_title("Animal Poplulation", fontsize=20)
-                ax6 = fig.add_subplot(ax[1:3, 0:2])
-                ax6.set_title("Herbivore Distribution", fontsize=20)
-                ax7 = fig.add_subplot(ax[1:3, 4:])
-                ax7.set_title("Carnivore Distribution", fontsize=20)
-
-                # Create Island Map
-                ax4.grid()
-                ax4.imshow(map_rgb)
-                ax4.set_xticks(range(len(map_rgb[0])))
-                ax4.set_xticklabels(range(1, 1 + len(map_rgb[0])))
-                ax4.set_yticks(range(len(map_rgb)))
-                ax4.set_yticklabels(range(1, 1 + len(map_rgb)))
-
-                water_patch = mpatches.Patch(color=(0.0, 0.0, 1.0), label="Water")
-                desert_patch = mpatches.Patch(color=(1.0, 1.0, 0.5), label="Desert")
-                highland_patch = mpatches.Patch(color=(0.5, 1.0, 0.5), label="Highland")
-                lowland_patch = mpatches.Patch(color=(0.0, 0.6, 0.0), label="Lowland")
-                ax4.legend(bbox_to_anchor=(0.5, -0.1), loc="upper center", mode="expand", ncol=2,
-                           handles=[lowland_patch, highland_patch, desert_patch, water_patch], fontsize=10)
-
-                # Create Herbivore Distribution Map
-                herb_dist = ax6.imshow(h_heatmap, vmin=0, vmax=self.cmax_animals["Herbivore"])
-                fig.colorbar(herb_dist, ax=ax6, location="left", shrink=0.5)
-                ax6.set_xticks(range(len(map_rgb[0])))
-                ax6.set_xticklabels(range(1, 1 + len(map_rgb[0])))
-                ax6.set_yticks(range(len(map_rgb)))
-                ax6.set_yticklabels(range(1, 1 + len(map_rgb)))
-                ax6.grid()
-
-                # Create Carnivore Distribution Map
-                carn_dist = ax7.imshow(c_heatmap, vmin=0, vmax=self.cmax_animals["Carnivore"])
-                ax7.grid()
-                fig.colorbar(carn_dist, ax=ax7, location="right", shrink=0.5)
-                ax7.set_xticks(range(len(map_rgb[0])))
-                ax7.set_xticklabels(range(1, 1 + len(map_rgb[0])))
-                ax7.set_yticks(range(len(map_rgb)))
-                ax7.set_yticklabels(range(1, 1 + len(map_rgb)))
-
-                # Create Animal Count per year
-                ax5.plot(h_pop, color='g', label='Herbivore', lw=5)
-                ax5.plot(c_pop, color='r', label='Cerbivore', lw=5)
-                ax5.grid()
-                ax5.set_ylim(0, self.ymax_animals)
-
-                # Create Age, Weight and Fitness Histogram
-                ax1.hist(h_age, bins=int(self.hist_specs["age"]["max"] // self.hist_specs["age"]["delta"]), color='g',
-                         label='Herbivore', histtype="step", range=[0, self.hist_specs["age"]["max"]], lw=5)
-                ax1.grid()
-
-                ax2.hist(h_weight, bins=int(self.hist_specs["weight"]["max"] // self.hist_specs["weight"]["delta"]),
-                         color='g', label='Herbivore', histtype="step", range=[0, self.hist_specs["weight"]["max"]], lw=5)
-                ax2.grid()
-                ax3.hist(h_fitness, bins=int(self.hist_specs["fitness"]["max"] // self.hist_specs["fitness"]["delta"]),
-                         color='g', label='Herbivore', histtype="step", range=[0, self.hist_specs["weight"]["max"]], lw=5)
-                ax3.grid()
-
-                ax1.hist(c_age, bins=int(self.hist_specs["age"]["max"] // self.hist_specs["age"]["delta"]), color='r',
-                         label="Carnivore", histtype="step", range=[0, self.hist_specs["age"]["max"]], lw=5)
-                ax2.hist(c_weight, bins=int(self.hist_specs["weight"]["max"] // self.hist_specs["weight"]["delta"]),
-                         color='r', label="Carnivore", histtype="step", range=[0, self.hist_specs["weight"]["max"]], lw=5)
-                ax3.hist(c_fitness, bins=int(self.hist_specs["fitness"]["max"] // self.hist_specs["fitness"]["delta"]),
-                         color='r', label="Carnivore", histtype="step", range=[0, self.hist_specs["fitness"]["max"]], lw=5)
-
-                # Save File
-                plt.savefig(plotfilename)
-                plt.close()
+    def _put(self, item):
+        """
+        The _Put function puts an item into the queue, waiting while it is full as long as all workers are alive.
+        """
+        while True:
+            try:
+                self.queue.put(item, timeout=1)
+                return
+            except queue.Full:
+                if not all(process.is_alive() for process in self.processes):
+                    raise RuntimeError('A frame rendering process has stopped.')
 
+    def close(self):
+        """
+        The Close function waits until all snapshots are saved and stops the worker processes. If a worker failed, the
+        others are stopped as well and a RuntimeError is raised.
+        :return:
+        """
+        try:
+            for _ in self.processes:
+                self._put(None)
+        except RuntimeError:
+            # The snapshots left in the queue would never be taken.
+            for process in self.processes:
+                process.terminate()
+        for process in self.processes:
+            process.join()
+        exitcodes = [process.exitcode for process in self.processes]
+        self.processes = []
+        if any(exitcodes):
+            self.queue.cancel_join_thread()
+            raise RuntimeError('A frame rendering process failed with exit code {}.'.format(
+                next(code for code in exitcodes if code)))
@@ -174,3 +174,59 @@ def test_birth_herbivore(creature, conditions, no_of_animals):
 
 
 
+@pytest.mark.parametrize("species, creatures", [(Herbivore, herbivores), (Carnivore, carnivores)])
+def test_fitness_batch(species, creatures):
+    age = np.array([creature['age'] for creature in creatures])
+    weight = np.array([creature['weight'] for creature in creatures], dtype=float)
+    phi = species.fitness_batch(age, weight)
+    for creature, value in zip(creatures, phi):
+        assert value == pytest.approx(species(creature).fitness())
+
+
+def test_fitness_cached():
+    beast = Herbivore({'age': 5, 'weight': 20, 'fitness': 0.0})
+    phi = beast.fitness()
+    beast.weight = 40
+    assert beast.fitness() > phi
+
+
+def test_compiled_params(monkeypatch):
+    params = Herbivore.compiled_params()
+    assert params.min_birth_weight == 3.5 * (8.0 + 1.5)
+    assert params.survival == 1 - 0.05
+    assert math.isnan(params.DeltaPhiMax)
+    assert Herbivore.compiled_params() is params
+    with pytest.raises(ValueError):
+        params.age_table[0] = 1.0
+    monkeypatch.setitem(Herbivore.params, 'eta', 0.1)
+    assert Herbivore.compiled_params().survival == 1 - 0.1
+
+
+def test_set_params(monkeypatch):
+    monkeypatch.setattr(Carnivore, 'params', dict(Carnivore.params))
+    Carnivore.set_params({'F': 60, 'DeltaPhiMax': 5.0})
+    assert (Carnivore.compiled_params().F, Carnivore.compiled_params().DeltaPhiMax) == (60.0, 5.0)
+
+
+def test_set_params_counts_version(monkeypatch):
+    assert isinstance(Herbivore.params, ParamDict) and isinstance(Carnivore.params, ParamDict)
+    monkeypatch.setattr(Carnivore, 'params', ParamDict(Carnivore.params))
+    params = Carnivore.compiled_params()
+    version = Carnivore.params.version
+    assert Carnivore.compiled_params() is params
+    Carnivore.set_params({'F': 60})
+    assert Carnivore.params.version > version
+    assert Carnivore.compiled_params().F == 60.0
+    del Carnivore.params['F']
+    Carnivore.params['F'] = 70
+    assert Carnivore.compiled_params().F == 70.0
+
+
+@pytest.mark.parametrize("params", [{'lambda': 1.0}, {'F': -1}, {'eta': 1.5}, {'DeltaPhiMax': 0}, {'mu': '0.2'},
+                                    {'beta': True}, {'omega': math.nan}])
+def test_set_params_invalid(params, monkeypatch):
+    monkeypatch.setattr(Carnivore, 'params', dict(Carnivore.params))
+    before = dict(Carnivore.params)
+    with pytest.raises(ValueError):
+        Carnivore.set_params(dict(params, w_birth=7.0))
+    assert Carnivore.params == before
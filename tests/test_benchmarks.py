@@ -0,0 +1,20 @@
+from benchmarks.bench_annual_cycle import compare, island_map, populated_island, run
+
+
+def test_island_map():
+    assert island_map(2) == "WWWW\nWLLW\nWLLW\nWWWW"
+
+
+def test_populated_island_has_streams():
+    island = populated_island(3, 10)
+    assert all(cell._streams is not None for cell in island.cells)
+    assert sum(len(cell.herb_pop) for cell in island.cells) == 90
+
+
+def test_run_and_compare():
+    results = run(sizes=(3,), densities=(10, 100), repeat=1, max_animals=100)
+    assert sorted(results['results']) == ['aging/3x3/10', 'feeding/3x3/10', 'migration/3x3/10',
+                                          'procreation/3x3/10', 'year/3x3/10']
+
+    baseline = {'results': dict(results['results'], **{'aging/3x3/10': results['results']['aging/3x3/10'] / 2})}
+    assert [name for name, _, _ in compare(results, baseline, threshold=0.5)] == ['aging/3x3/10']
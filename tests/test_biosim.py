@@ -0,0 +1,82 @@
+import pytest
+from src.biosim.biosim import BioSim
+from src.biosim.animals import Herbivore
+from src.biosim.land import HighLand, LowLand
+from src.biosim.logger import read_log
+
+
+@pytest.fixture
+def island_map():
+    return "WWWWW\nWLHLW\nWLLDW\nWWWWW"
+
+
+@pytest.fixture
+def ini_pop():
+    return [{'loc': (2, 2), 'pop': [{'species': 'Herbivore', 'age': 5, 'weight': 20} for _ in range(50)]}]
+
+
+@pytest.mark.parametrize("engine, workers", [("serial", 1), ("serial", 2), ("vectorized", 1)])
+def test_set_landscape_parameters(island_map, ini_pop, engine, workers, monkeypatch):
+    monkeypatch.setattr(LowLand, 'f_max', LowLand.f_max)
+    with BioSim(island_map, ini_pop=ini_pop, vis_years=0, engine=engine, workers=workers, quiet=True) as sim:
+        sim.set_landscape_parameters('L', {'f_max': 0})
+        sim.simulate(1)
+        # Without grass every herbivore only loses weight.
+        assert sim.statistics.moments['Herbivore']['weight'].mean == pytest.approx(20 * (1 - 0.05))
+    assert LowLand.f_max == 0.0
+    assert HighLand.f_max == 20.0
+
+
+@pytest.mark.parametrize("landscape, params", [('W', {'f_max': 10}), ('X', {'f_max': 10}), ('L', {'alpha': 1}),
+                                               ('L', {'f_max': -1}), ('H', {'f_max': '20'})])
+def test_set_landscape_parameters_invalid(island_map, landscape, params):
+    sim = BioSim(island_map, vis_years=0, quiet=True)
+    with pytest.raises(ValueError):
+        sim.set_landscape_parameters(landscape, params)
+
+
+@pytest.mark.parametrize("engine, workers", [("serial", 1), ("serial", 2), ("vectorized", 1)])
+def test_set_animal_parameters(island_map, ini_pop, engine, workers, monkeypatch):
+    monkeypatch.setattr(Herbivore, 'params', dict(Herbivore.params))
+    with BioSim(island_map, ini_pop=ini_pop, vis_years=0, engine=engine, workers=workers, quiet=True) as sim:
+        sim.set_animal_parameters('Herbivore', {'omega': 0.0, 'mu': 0.0, 'F': 0.0})
+        sim.simulate(1)
+        # Without food or deaths every herbivore stays in its cell and only loses weight.
+        assert sim.num_animals_per_species['Herbivore'] == 50
+        assert sim.statistics.moments['Herbivore']['weight'].mean == pytest.approx(20 * (1 - 0.05))
+
+
+@pytest.mark.parametrize("species, params", [('Wolf', {'F': 10}), ('Herbivore', {'F': -10})])
+def test_set_animal_parameters_invalid(island_map, species, params):
+    sim = BioSim(island_map, vis_years=0, quiet=True)
+    with pytest.raises(ValueError):
+        sim.set_animal_parameters(species, params)
+
+
+def test_close_stops_workers(island_map, ini_pop):
+    with BioSim(island_map, ini_pop=ini_pop, vis_years=0, workers=2, quiet=True) as sim:
+        processes = list(sim.island.processes)
+        sim.simulate(1)
+    assert processes and not any(process.is_alive() for process in processes)
+
+
+def test_worker_error_reaches_caller(island_map):
+    ini_pop = [{'loc': (2, 2), 'pop': [{'species': 'Herbivore', 'age': 5, 'weight': -20}]}]
+    with pytest.raises(ValueError, match='weight'):
+        BioSim(island_map, ini_pop=ini_pop, vis_years=0, workers=2, quiet=True)
+
+
+def test_failing_year_flushes_log(island_map, ini_pop, tmp_path, monkeypatch):
+    log_path = str(tmp_path / 'log.csv')
+    sim = BioSim(island_map, ini_pop=ini_pop, vis_years=0, quiet=True, log_file=log_path, log_flush_years=10)
+    annual_cycle = sim.island.annual_cycle
+
+    def failing_cycle(statistics):
+        if sim.year == 2:
+            raise RuntimeError('year failed')
+        annual_cycle(statistics)
+
+    monkeypatch.setattr(sim.island, 'annual_cycle', failing_cycle)
+    with pytest.raises(RuntimeError, match='year failed'):
+        sim.simulate(5)
+    assert read_log(log_path)[:, 0].tolist() == [1, 2]
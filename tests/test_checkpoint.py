@@ -0,0 +1,137 @@
+import numpy as np
+import pytest
+from src.biosim.biosim import BioSim
+from src.biosim.animals import Herbivore
+from src.biosim.checkpoint import *
+from src.biosim.land import LowLand
+from src.biosim.logger import read_log
+
+geography = """\
+WWWWW
+WLLHW
+WDLLW
+WWWWW"""
+
+ini_pop = [{'loc': (2, 2), 'pop': [{'species': 'Herbivore', 'age': 5, 'weight': 20} for _ in range(50)] +
+                                  [{'species': 'Carnivore', 'age': 5, 'weight': 20} for _ in range(5)]}]
+
+
+@pytest.mark.parametrize("mmap", [True, False])
+def test_write_and_read_checkpoint(tmp_path, mmap):
+    arrays = {'age': np.arange(5), 'weight': np.linspace(0, 1, 7), 'empty': np.zeros((0, 2))}
+    write_checkpoint(str(tmp_path / 'state.ckpt'), {'year': 3}, arrays)
+    header, loaded = read_checkpoint(str(tmp_path / 'state.ckpt'), mmap=mmap)
+    assert header == {'year': 3}
+    for name, array in arrays.items():
+        assert np.array_equal(loaded[name], array)
+        assert loaded[name].shape == array.shape
+
+
+def test_not_a_checkpoint(tmp_path):
+    (tmp_path / 'other.txt').write_text('hello')
+    with pytest.raises(ValueError):
+        read_checkpoint(str(tmp_path / 'other.txt'))
+
+
+@pytest.mark.parametrize("engine", ["serial", "vectorized"])
+def test_resume_bit_identical(tmp_path, engine):
+    path = str(tmp_path / 'sim.ckpt')
+    sim = BioSim(geography, ini_pop, seed=2, engine=engine, quiet=True)
+    sim.simulate(5)
+    sim.save_checkpoint(path)
+    sim.simulate(5)
+
+    resumed = BioSim.load_checkpoint(path, quiet=True)
+    assert resumed.year == 5
+    resumed.simulate(5)
+    assert resumed.year == sim.year
+    assert resumed.island.cell_counts() == sim.island.cell_counts()
+    state, resumed_state = sim.island.export_state(), resumed.island.export_state()
+    for name in state:
+        assert np.array_equal(state[name], resumed_state[name])
+
+
+def test_resume_with_workers(tmp_path):
+    path = str(tmp_path / 'sim.ckpt')
+    sim = BioSim(geography, ini_pop, seed=2, quiet=True)
+    sim.simulate(3)
+    sim.save_checkpoint(path)
+    sim.simulate(3)
+
+    with BioSim.load_checkpoint(path, quiet=True, workers=2) as resumed:
+        resumed.simulate(3)
+        assert resumed.island.cell_counts() == sim.island.cell_counts()
+
+
+@pytest.mark.parametrize("engine", ["serial", "vectorized"])
+def test_save_over_loaded_checkpoint(tmp_path, engine):
+    path = str(tmp_path / 'sim.ckpt')
+    sim = BioSim(geography, ini_pop, seed=2, engine=engine, quiet=True)
+    sim.simulate(2)
+    sim.save_checkpoint(path)
+
+    resumed = BioSim.load_checkpoint(path, quiet=True)
+    before = resumed.island.export_state()
+    # A longer header moves the array blocks of the rewritten file.
+    resumed.hist_specs = {'weight': {'max': 80, 'delta': 2}, 'age': {'max': 60, 'delta': 2},
+                          'fitness': {'max': 1.0, 'delta': 0.05}}
+    resumed.save_checkpoint(path)
+    after = resumed.island.export_state()
+    for name in before:
+        assert np.array_equal(before[name], after[name])
+    assert [entry.name for entry in tmp_path.iterdir()] == ['sim.ckpt']
+
+
+def test_streams_restored_lazily(tmp_path):
+    path = str(tmp_path / 'sim.ckpt')
+    sim = BioSim(geography, ini_pop, seed=2, quiet=True)
+    sim.simulate(3)
+    sim.save_checkpoint(path)
+
+    resumed = BioSim.load_checkpoint(path, quiet=True)
+    assert all(cell._streams is None for cell in resumed.island.cells)
+    assert np.array_equal(resumed.island.export_state()['streams'], sim.island.export_state()['streams'])
+    sim.simulate(3)
+    resumed.simulate(3)
+    assert resumed.island.cell_counts() == sim.island.cell_counts()
+
+
+@pytest.mark.parametrize("log_name", ["log.csv", "log.bin"])
+def test_resume_appends_to_log(tmp_path, log_name):
+    path, log_path = str(tmp_path / 'sim.ckpt'), str(tmp_path / log_name)
+    sim = BioSim(geography, ini_pop, seed=2, quiet=True, log_file=log_path, log_flush_years=1)
+    sim.simulate(3)
+    sim.save_checkpoint(path)
+    # The simulation crashes after writing two more years.
+    sim.simulate(2)
+    expected = read_log(log_path).tolist()
+
+    resumed = BioSim.load_checkpoint(path, quiet=True, log_file=log_path)
+    assert read_log(log_path).tolist() == expected[:3]
+    resumed.simulate(2)
+    assert read_log(log_path).tolist() == expected
+    if log_name.endswith('.csv'):
+        with open(log_path) as log:
+            assert log.read().count('Year') == 1
+
+
+@pytest.mark.parametrize("kwargs", [{'seed': 5}, {'engine': 'vectorized'}, {'hist_specs': {}}, {'ini_pop': []}])
+def test_load_checkpoint_rejects_stored_arguments(tmp_path, kwargs):
+    path = str(tmp_path / 'sim.ckpt')
+    BioSim(geography, ini_pop, quiet=True).save_checkpoint(path)
+    with pytest.raises(ValueError):
+        BioSim.load_checkpoint(path, quiet=True, **kwargs)
+
+
+@pytest.mark.parametrize("section, name, params", [('animal_params', 'Herbivore', {'F': -10}),
+                                                   ('landscape_params', 'L', {'f_max': -1})])
+def test_load_checkpoint_checks_parameters(tmp_path, monkeypatch, section, name, params):
+    monkeypatch.setattr(Herbivore, 'params', dict(Herbivore.params))
+    monkeypatch.setattr(LowLand, 'f_max', LowLand.f_max)
+    path = str(tmp_path / 'sim.ckpt')
+    BioSim(geography, ini_pop, quiet=True).save_checkpoint(path)
+    header, state = read_checkpoint(path, mmap=False)
+    header[section][name].update(params)
+    write_checkpoint(path, header, state)
+    with pytest.raises(ValueError):
+        BioSim.load_checkpoint(path, quiet=True)
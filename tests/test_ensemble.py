@@ -0,0 +1,65 @@
+import numpy as np
+import pytest
+from src.biosim.biosim import BioSim
+from src.biosim.ensemble import BioSimEnsemble
+
+
+@pytest.fixture
+def island_map():
+    return "WWWWWW\nWLLHLW\nWLLDLW\nWHLLLW\nWWWWWW"
+
+
+@pytest.fixture
+def ini_pop():
+    return [{'loc': (2, 2), 'pop': [{'species': 'Herbivore', 'age': 5, 'weight': 20} for _ in range(40)] +
+                                   [{'species': 'Carnivore', 'age': 5, 'weight': 20} for _ in range(5)]}]
+
+
+def test_single_seed_same_as_vectorized(island_map, ini_pop):
+    ensemble = BioSimEnsemble(island_map, ini_pop, seeds=[3])
+    counts = ensemble.simulate(10)
+    sim = BioSim(island_map, ini_pop=ini_pop, seed=3, engine="vectorized", vis_years=0, quiet=True)
+    sim.simulate(10)
+    assert counts['Herbivore'].shape == (10, 1)
+    assert {species: int(count[0]) for species, count in ensemble.num_animals_per_species.items()} == \
+        sim.num_animals_per_species
+
+
+def test_every_replicate_same_as_vectorized(island_map, ini_pop):
+    seeds = [3, 7, 3]
+    ensemble = BioSimEnsemble(island_map, ini_pop, seeds=seeds)
+    counts = ensemble.simulate(10)
+    for replicate, seed in enumerate(seeds):
+        sim = BioSim(island_map, ini_pop=ini_pop, seed=seed, engine="vectorized", vis_years=0, quiet=True)
+        for year in range(10):
+            sim.simulate(1)
+            assert {species: int(count[year, replicate]) for species, count in counts.items()} == \
+                sim.num_animals_per_species
+
+
+def test_export_and_import_state(island_map, ini_pop):
+    ensemble = BioSimEnsemble(island_map, ini_pop, seeds=[1, 2])
+    ensemble.simulate(3)
+    resumed = BioSimEnsemble(island_map, seeds=[5, 6])
+    resumed.island.import_state(ensemble.island.export_state())
+    assert np.array_equal(resumed.simulate(3)['Herbivore'], ensemble.simulate(3)['Herbivore'])
+
+
+def test_replicates(island_map, ini_pop):
+    ensemble = BioSimEnsemble(island_map, ini_pop, seeds=range(8))
+    first = ensemble.simulate(5)
+    ensemble.simulate(5)
+    assert ensemble.year == 10
+    assert ensemble.counts['Carnivore'].shape == (10, 8)
+    assert np.array_equal(ensemble.counts['Herbivore'][:5], first['Herbivore'])
+    assert len(set(ensemble.counts['Herbivore'][-1].tolist())) > 1
+    # The same seeds give the same ensemble.
+    again = BioSimEnsemble(island_map, ini_pop, seeds=range(8))
+    again.simulate(10)
+    assert np.array_equal(again.counts['Herbivore'], ensemble.counts['Herbivore'])
+
+
+@pytest.mark.parametrize("seeds", [[], [-1], [1.5]])
+def test_invalid_seeds(island_map, seeds):
+    with pytest.raises(ValueError):
+        BioSimEnsemble(island_map, seeds=seeds)
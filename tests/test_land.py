@@ -51,3 +51,98 @@ def test_insert_pop(create_habitable_island, lowland_herbivores, lowland_carnivo
             assert len(cell.herb_pop) + len(cell.carn_pop) == herb_pop + carn_pop
 
 
+def test_feeding_herbivores(create_habitable_island, lowland_herbivores):
+    island = create_habitable_island
+    island.insert_pop(lowland_herbivores)
+    for cell in island.cells:
+        if cell.coord == (1, 1):
+            cell.feeding()
+            # 50 units of grass feed five herbivores with F = 10.
+            assert cell.grass == 0
+            assert (cell.herb_pop.weight > 20).sum() == 5
+
+
+def test_grazing_fittest_first():
+    cell = HighLand((1, 1))
+    cell.herb_pop.append([5, 5, 5, 60], [30, 10, 20, 40])
+    cell.feeding()
+    # 20 units of grass feed the two fittest herbivores, which stay ordered by ascending fitness.
+    assert cell.grass == 0
+    assert sorted(cell.herb_pop.weight) == pytest.approx(sorted([30 + 9, 20 + 9, 10, 40]))
+    assert list(cell.herb_pop.fitness) == sorted(cell.herb_pop.fitness)
+
+
+def test_insert_pop_outside_island(create_habitable_island):
+    with pytest.raises(ValueError):
+        create_habitable_island.insert_pop([{'loc': (5, 5), 'pop': [{'species': 'Herbivore', 'age': 5,
+                                                                     'weight': 20}]}])
+
+
+def test_neighbours(create_habitable_island):
+    neighbours = create_habitable_island.neighbours((1, 1))
+    assert sorted(cell.coord for cell in neighbours) == [(1, 2), (2, 1)]
+
+
+def test_cell_counts(create_habitable_island, lowland_herbivores, highland_carnivores):
+    island = create_habitable_island
+    island.insert_pop(lowland_herbivores + highland_carnivores)
+    counts = island.cell_counts()
+    assert counts[(1, 1)] == (10, 0)
+    assert counts[(2, 1)] == (0, 10)
+    assert counts[(2, 2)] == (0, 0)
+
+
+def test_migration_keeps_animals_on_island(create_habitable_island, lowland_herbivores, lowland_carnivores):
+    island = create_habitable_island
+    island.insert_pop(lowland_herbivores + lowland_carnivores)
+    start = island.cell_map[(1, 1)]
+    for cell in island.cells:
+        cell.migration()
+    arrived = sum(len(block["_age"]) for cell in island.cells for _, block in cell.herb_incoming + cell.carn_incoming)
+    assert len(start.herb_pop) + len(start.carn_pop) + arrived == 20
+    # (2, 2) is not a neighbour of (1, 1), so no animal can reach it in one year.
+    assert len(island.cell_map[(2, 2)].herb_incoming) == 0
+
+    for cell in island.cells:
+        cell.settle_migrants()
+    assert sum(island.num_animals_per_species.values()) == 20
+
+
+def test_results_independent_of_cell_order(lowland_herbivores, highland_herbivores):
+    land_map = {(1, 1): 'L', (1, 2): 'D', (2, 1): 'H', (2, 2): 'L'}
+    forward = Island(land_map, seed=4)
+    backward = Island(dict(reversed(list(land_map.items()))), seed=4)
+    for island in (forward, backward):
+        island.insert_pop(lowland_herbivores + highland_herbivores)
+        for _ in range(5):
+            island.annual_cycle()
+    assert forward.cell_counts() == backward.cell_counts()
+
+
+def test_parse_map():
+    geography = parse_map("WWWW\nWLHW\nWDWW\nWWWW")
+    assert geography.shape == (4, 4)
+    assert habitable_cells(geography) == {(2, 2): 'L', (3, 2): 'H', (2, 3): 'D'}
+
+
+@pytest.mark.parametrize("island_map", ["", "WWW\nWLWW\nWWW", "WWW\nWXW\nWWW", "WWW\nWLL\nWWW", "WWW\nWÖW\nWWW"])
+def test_parse_map_invalid(island_map):
+    with pytest.raises(ValueError):
+        parse_map(island_map)
+
+
+def test_only_occupied_cells_active(create_habitable_island, lowland_herbivores):
+    island = create_habitable_island
+    assert island.active == set()
+    island.insert_pop(lowland_herbivores)
+    assert island.active == {island.cell_map[(1, 1)]}
+    for _ in range(3):
+        island.annual_cycle()
+        assert island.active == {cell for cell in island.cells if len(cell.herb_pop) + len(cell.carn_pop)}
+
+
+def test_set_landscape_parameters(create_habitable_island):
+    island = create_habitable_island
+    island.set_landscape_parameters('L', {'f_max': 100.0})
+    island.replant()
+    assert [island.cell_map[coord].grass for coord in ((1, 1), (2, 2), (2, 1), (1, 2))] == [100.0, 100.0, 20.0, 0.0]
@@ -0,0 +1,48 @@
+import numpy as np
+import pytest
+from src.biosim.logger import *
+from src.biosim.statistics import PopulationStatistics
+
+
+@pytest.fixture
+def statistics():
+    statistics = PopulationStatistics()
+    statistics.add('Herbivore', np.array([1, 2]), np.array([10.0, 20.0]), np.array([0.5, 0.6]), (1, 1))
+    statistics.add('Carnivore', np.array([3]), np.array([30.0]), np.array([0.7]), (1, 1))
+    statistics.add('Herbivore', np.array([3]), np.array([30.0]), np.array([0.7]), (2, 1))
+    statistics.add('Carnivore', np.array([]), np.array([]), np.array([]), (2, 1))
+    return statistics
+
+
+@pytest.mark.parametrize("file_name", ["log.csv", "log.bin"])
+def test_year_log(tmp_path, statistics, file_name):
+    path = str(tmp_path / file_name)
+    log = YearLog(path, flush_years=2, per_cell=True)
+    log.write(1, statistics)
+    assert len(read_log(path)) == 0
+    log.write(2, statistics)
+    log.write(3, statistics)
+    assert len(read_log(path)) == 2
+    log.flush()
+
+    assert read_log(path).tolist() == [[1, 3, 1], [2, 3, 1], [3, 3, 1]]
+    cells = read_log(log.cell_path, per_cell=True)
+    assert cells[:2].tolist() == [[1, 1, 1, 2, 1], [1, 2, 1, 1, 0]]
+
+
+@pytest.mark.parametrize("file_name, fmt, expected", [("log.txt", None, 'csv'), ("log", None, 'csv'),
+                                                      ("log.bin", None, 'binary'), ("log.dat", 'binary', 'binary')])
+def test_log_format(tmp_path, statistics, file_name, fmt, expected):
+    path = str(tmp_path / file_name)
+    log = YearLog(path, fmt=fmt)
+    assert log.fmt == expected
+    log.write(1, statistics)
+    log.flush()
+    with open(path, 'rb') as log_file:
+        assert log_file.read().startswith(b'Year,') == (expected == 'csv')
+    assert read_log(path, fmt=fmt).tolist() == [[1, 3, 1]]
+
+
+def test_unknown_format(tmp_path):
+    with pytest.raises(ValueError):
+        YearLog(str(tmp_path / 'log.txt'), fmt='json')
@@ -0,0 +1,65 @@
+import pytest
+from src.biosim.animals import Herbivore
+from src.biosim.land import Island, LowLand
+from src.biosim.parallel import *
+
+
+@pytest.fixture
+def land_map():
+    return {(x_ax, y_ax): 'L' if (x_ax + y_ax) % 3 else 'H' for x_ax in range(1, 7) for y_ax in range(1, 5)}
+
+
+@pytest.fixture
+def ini_pop():
+    return [{'loc': (3, 2), 'pop': [{'species': 'Herbivore', 'age': 5, 'weight': 20} for _ in range(40)] +
+                                   [{'species': 'Carnivore', 'age': 5, 'weight': 20} for _ in range(5)]}]
+
+
+@pytest.mark.parametrize("workers", [1, 2, 4, 6])
+def test_split_into_tiles(land_map, workers):
+    tiles = split_into_tiles(land_map, workers)
+    assert len(tiles) == workers
+    assert sorted(coord for tile in tiles for coord in tile) == sorted(land_map)
+
+
+@pytest.mark.parametrize("workers", [2, 3, 4])
+def test_same_result_for_any_worker_count(land_map, ini_pop, workers):
+    serial = Island(land_map, seed=3)
+    serial.insert_pop(ini_pop)
+    tiled = TiledIsland(land_map, seed=3, workers=workers)
+    try:
+        tiled.insert_pop(ini_pop)
+        for _ in range(10):
+            serial.annual_cycle()
+            tiled.annual_cycle()
+        assert tiled.cell_counts() == serial.cell_counts()
+    finally:
+        tiled.close()
+
+
+def test_spawned_workers_use_current_parameters(land_map, ini_pop, monkeypatch):
+    monkeypatch.setitem(Herbivore.params, 'F', 4.0)
+    monkeypatch.setattr(LowLand, 'f_max', 300.0)
+    serial = Island(land_map, seed=3)
+    serial.insert_pop(ini_pop)
+    tiled = TiledIsland(land_map, seed=3, workers=2, start_method='spawn')
+    try:
+        tiled.insert_pop(ini_pop)
+        for _ in range(5):
+            serial.annual_cycle()
+            tiled.annual_cycle()
+        assert tiled.cell_counts() == serial.cell_counts()
+    finally:
+        tiled.close()
+
+
+def test_worker_error_reaches_caller(land_map, ini_pop):
+    tiled = TiledIsland(land_map, seed=3, workers=2)
+    try:
+        with pytest.raises(ValueError, match='weight'):
+            tiled.insert_pop([{'loc': (1, 1), 'pop': [{'species': 'Herbivore', 'age': 5, 'weight': -20}]}])
+        # The workers stay alive and keep answering.
+        tiled.insert_pop(ini_pop)
+        assert tiled.num_animals_per_species == {'Herbivore': 40, 'Carnivore': 5}
+    finally:
+        tiled.close()
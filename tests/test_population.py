@@ -0,0 +1,203 @@
+import numpy as np
+import pytest
+from src.biosim.population import *
+from src.biosim.animals import Herbivore, Carnivore
+from src.biosim.biosim import BioSim
+
+
+@pytest.fixture
+def herbivore_pop():
+    pop = Population(Herbivore)
+    pop.append([5, 0, 10, 100], [20, 20, 50, 200])
+    return pop
+
+
+def test_append(herbivore_pop):
+    assert len(herbivore_pop) == 4
+    assert list(herbivore_pop.age) == [5, 0, 10, 100]
+    assert list(herbivore_pop.weight) == [20, 20, 50, 200]
+    assert herbivore_pop.alive.all()
+
+
+@pytest.mark.parametrize("age, weight", [(-1, 20), (5, -20)])
+def test_append_invalid(age, weight):
+    with pytest.raises(ValueError):
+        Population(Carnivore).append(age, weight)
+
+
+@pytest.mark.parametrize("idx", range(4))
+def test_fitness_matches_animal(herbivore_pop, idx):
+    animal = Herbivore({'age': herbivore_pop.age[idx], 'weight': herbivore_pop.weight[idx], 'fitness': 0.0})
+    assert herbivore_pop.fitness[idx] == pytest.approx(animal.fitness())
+
+
+def test_sort_by_fitness(herbivore_pop):
+    herbivore_pop.sort_by_fitness(descending=True)
+    assert all(herbivore_pop.fitness[:-1] >= herbivore_pop.fitness[1:])
+
+
+def test_remove_dead(herbivore_pop):
+    herbivore_pop.alive[[0, 2]] = False
+    assert herbivore_pop.remove_dead() == 2
+    assert list(herbivore_pop.age) == [0, 100]
+
+
+def test_to_dicts(herbivore_pop):
+    animals = herbivore_pop.to_dicts()
+    assert animals[0] == Herbivore({'age': 5, 'weight': 20, 'fitness': 0.0}).get_dict()
+
+
+def test_aging(herbivore_pop):
+    weight = herbivore_pop.weight.copy()
+    herbivore_pop.aging(rng=np.random.default_rng(3))
+    assert len(herbivore_pop) <= 4
+    assert all(herbivore_pop.age >= 1)
+    assert set(herbivore_pop.weight).issubset(set(weight * (1 - Herbivore.params['eta'])))
+
+
+def test_aging_starved_animals_die():
+    pop = Population(Carnivore)
+    pop.append([1, 2, 3], [0, 0, 0])
+    assert pop.aging() == 3
+    assert len(pop) == 0
+
+
+def test_take_and_extend(herbivore_pop):
+    other = Population(Herbivore)
+    other.extend([herbivore_pop.take([0, 3]), herbivore_pop.take([1])])
+    assert list(other.age) == [5, 100, 0]
+    assert list(other.fitness) == [herbivore_pop.fitness[idx] for idx in (0, 3, 1)]
+
+
+def test_draw_migrants(herbivore_pop):
+    direction = herbivore_pop.draw_migrants(4, rng=np.random.default_rng(1))
+    assert len(direction) == 4
+    assert all((direction >= -1) & (direction < 4))
+
+
+def test_hunt_kill_probability():
+    """Every carnivore gets one herbivore of its own cell, killed with probability (phi - phi_prey) / DeltaPhiMax."""
+    cells = 4000
+    herbs = Population(Herbivore)
+    herbs.append(np.full(cells, 5), np.full(cells, 20.0))
+    carns = Population(Carnivore)
+    carns.append(np.full(cells, 5), np.full(cells, 20.0))
+    probability = (carns.fitness[0] - herbs.fitness[0]) / Carnivore.params['DeltaPhiMax']
+    bounds = np.arange(cells)
+
+    eaten = hunt(herbs, carns, bounds, bounds + 1, bounds, bounds + 1, np.random.default_rng(3))
+    assert eaten == cells - np.count_nonzero(herbs.alive)
+    assert eaten / cells == pytest.approx(probability, abs=0.03)
+    assert np.count_nonzero(carns.weight > 20) == eaten
+
+
+def test_hunt_single_cell_kill_probability(monkeypatch):
+    """A carnivore that is never full tries every weaker herbivore of its cell once."""
+    monkeypatch.setitem(Carnivore.params, 'F', 1e9)
+    herbs = Population(Herbivore)
+    herbs.append(np.full(20000, 5), np.linspace(1.0, 40.0, 20000))
+    carns = Population(Carnivore)
+    carns.append([5], [60.0])
+    probability = np.clip((carns.fitness[0] - herbs.fitness) / Carnivore.params['DeltaPhiMax'], 0, 1)
+
+    eaten = hunt(herbs, carns, [0], [20000], [0], [1], np.random.default_rng(3))
+    assert eaten == pytest.approx(probability.sum(), rel=0.05)
+    assert probability[~herbs.alive].mean() > probability[herbs.alive].mean()
+
+
+def test_hunt_spares_fitter_herbivores():
+    herbs = Population(Herbivore)
+    herbs.append([5, 5], [40.0, 50.0])
+    carns = Population(Carnivore)
+    carns.append([80, 80], [5.0, 5.0])
+    assert carns.fitness.max() < herbs.fitness.min()
+    assert hunt(herbs, carns, [0], [2], [0], [2]) == 0
+    assert list(carns.weight) == [5.0, 5.0]
+
+
+def test_hunt_stops_when_full(monkeypatch):
+    monkeypatch.setitem(Carnivore.params, 'DeltaPhiMax', 1e-9)
+    herbs = Population(Herbivore)
+    herbs.append([50, 50, 50, 50], [30.0, 30.0, 30.0, 30.0])
+    carns = Population(Carnivore)
+    carns.append([5, 5], [20.0, 20.0])
+    # Each carnivore eats two herbivores, the second one only partly, until it has eaten F = 50.
+    assert hunt(herbs, carns, [0], [4], [0], [2]) == 4
+    assert list(carns.weight) == pytest.approx([20 + 0.75 * 50] * 2)
+
+
+def test_capacity_grows_geometrically():
+    pop = Population(Herbivore)
+    capacities = set()
+    for _ in range(1000):
+        pop.append(5, 20)
+        capacities.add(pop.capacity)
+    assert len(pop) == 1000
+    assert len(capacities) <= 8
+    pop.alive[::2] = False
+    pop.remove_dead()
+    assert len(pop) == 500 and pop.capacity >= 1000
+
+
+def test_procreation(monkeypatch):
+    monkeypatch.setitem(Herbivore.params, 'sigma_birth', 0.0)
+    pop = Population(Herbivore)
+    pop.append([5, 5, 5], [40.0, 40.0, 20.0])
+    # gamma * phi * (N - 1) >= 1 makes every heavy enough animal give birth.
+    newborns = pop.procreation(100)
+    assert newborns == 2
+    assert list(pop.age) == [5, 5, 5, 0, 0]
+    expected = 40.0 - Herbivore.params['xi'] * Herbivore.params['w_birth']
+    assert list(pop.weight) == pytest.approx([expected, expected, 20.0, 8.0, 8.0])
+    assert list(pop.fitness) == pytest.approx(list(Herbivore.fitness_batch(pop.age, pop.weight)))
+
+
+def test_remove_dead_releases_memory_above_max_fragmentation():
+    pop = Population(Herbivore)
+    pop.append(np.full(1000, 5), np.full(1000, 20.0))
+    capacity = pop.capacity
+    pop.alive[:500] = False
+    pop.remove_dead()
+    assert pop.capacity == capacity
+    pop.alive[:400] = False
+    pop.remove_dead()
+    assert pop.capacity == 200
+    assert pop.fragmentation == 0.5
+    assert pool_stats([pop, pop]) == {'animals': 200, 'capacity': 400, 'fragmentation': 0.5}
+
+
+def test_remove_dead_shrinks_once_max_fragmentation_is_exceeded():
+    pop = Population(Herbivore)
+    pop.append(np.full(1000, 5), np.full(1000, 20.0))
+    survivors = int(pop.capacity * (1 - Population.max_fragmentation))
+    pop.alive[survivors:] = False
+    pop.remove_dead()
+    assert pop.capacity == 1000 and pop.fragmentation == Population.max_fragmentation
+    pop.alive[0] = False
+    pop.remove_dead()
+    assert pop.capacity == 2 * (survivors - 1)
+
+
+def test_capacity_stays_flat_at_steady_state():
+    pop = Population(Herbivore)
+    pop.append(np.full(1000, 5), np.full(1000, 20.0))
+    capacities = set()
+    for _ in range(50):
+        pop.alive[:300] = False
+        pop.remove_dead()
+        pop.append(np.zeros(300, dtype=int), np.full(300, 8.0))
+        capacities.add(pop.capacity)
+    assert len(pop) == 1000
+    assert capacities == {1000}
+
+
+@pytest.mark.parametrize("engine, workers", [("serial", 1), ("serial", 2), ("vectorized", 1)])
+def test_pool_stats(engine, workers):
+    ini_pop = [{'loc': (2, 2), 'pop': [{'species': 'Herbivore', 'age': 5, 'weight': 20} for _ in range(50)] +
+                [{'species': 'Carnivore', 'age': 5, 'weight': 20} for _ in range(5)]}]
+    with BioSim("WWWWW\nWLLHW\nWLDLW\nWWWWW", ini_pop, vis_years=0, quiet=True, engine=engine, workers=workers) as sim:
+        sim.simulate(3)
+        stats = sim.pool_stats
+        assert stats['Herbivore']['animals'] == sim.num_animals_per_species['Herbivore']
+    assert stats['Carnivore']['capacity'] >= stats['Carnivore']['animals']
+    assert 0 <= stats['Herbivore']['fragmentation'] < 1
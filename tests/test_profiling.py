@@ -0,0 +1,46 @@
+import pytest
+from src.biosim.biosim import BioSim
+from src.biosim.logger import read_log
+from src.biosim.profiling import PhaseStats, profile_columns
+
+geography = "WWWWW\nWLLHW\nWLDLW\nWWWWW"
+ini_pop = [{'loc': (2, 2), 'pop': [{'species': 'Herbivore', 'age': 5, 'weight': 20} for _ in range(50)] +
+            [{'species': 'Carnivore', 'age': 5, 'weight': 20} for _ in range(5)]}]
+
+
+def test_phase_stats_merge():
+    profile, other = PhaseStats(), PhaseStats()
+    profile.add('feeding', 1.0, 10)
+    other.add('feeding', 0.5, 5)
+    other.births = 3
+    profile.merge(other)
+    profile.end_year(1, 12)
+    summary = profile.summary()
+    assert summary['phases']['feeding'] == {'seconds': 1.5, 'calls': 2, 'animals': 15}
+    assert summary['births'] == 3
+    assert summary['peak_population'] == 12
+
+
+@pytest.mark.parametrize("engine, workers", [("serial", 1), ("serial", 2), ("vectorized", 1)])
+def test_profile_does_not_change_results(engine, workers):
+    counts = []
+    for profile in (False, True):
+        with BioSim(geography, ini_pop, vis_years=0, quiet=True, engine=engine, workers=workers,
+                    profile=profile) as sim:
+            sim.simulate(5)
+            counts.append(sim.num_animals_per_species)
+    assert counts[0] == counts[1]
+
+    profile = sim.profile
+    assert profile.calls['feeding'] == 5 * workers
+    assert [year['year'] for year in profile.years] == [1, 2, 3, 4, 5]
+    assert 55 + sum(year['births'] - year['deaths'] for year in profile.years) == sum(counts[1].values())
+
+
+def test_profile_log(tmp_path):
+    path = str(tmp_path / 'log.csv')
+    sim = BioSim(geography, ini_pop, vis_years=0, quiet=True, log_file=path, profile=True)
+    sim.simulate(3)
+    records = read_log(sim.log.profile_path, profile=True)
+    assert records.shape == (3, len(profile_columns))
+    assert records[:, 3].tolist() == [year['population'] for year in sim.profile.years]
@@ -0,0 +1,60 @@
+import numpy as np
+import pytest
+from src.biosim.statistics import *
+
+
+@pytest.fixture
+def values():
+    return np.random.default_rng(2).normal(10, 3, 1000)
+
+
+def test_running_stats(values):
+    stats = RunningStats()
+    for batch in np.array_split(values, 7):
+        stats.add(batch)
+    assert stats.count == 1000
+    assert stats.mean == pytest.approx(np.mean(values))
+    assert stats.variance == pytest.approx(np.var(values))
+
+
+def test_running_stats_merge(values):
+    first, second = RunningStats(), RunningStats()
+    first.add(values[:300])
+    second.add(values[300:])
+    first.merge(second)
+    assert first.mean == pytest.approx(np.mean(values))
+    assert first.variance == pytest.approx(np.var(values))
+
+
+def test_histogram_matches_numpy(values):
+    histogram = Histogram(20, 2)
+    histogram.add(values)
+    expected, _ = np.histogram(values, bins=10, range=(0, 20))
+    assert list(histogram.counts) == list(expected)
+
+
+def test_population_statistics():
+    statistics = PopulationStatistics({'weight': {'max': 50, 'delta': 5}})
+    statistics.add('Herbivore', np.array([1, 2]), np.array([10.0, 20.0]), np.array([0.5, 0.6]), (1, 1))
+    statistics.add('Herbivore', np.array([3]), np.array([30.0]), np.array([0.7]), (1, 2))
+    assert statistics.num_animals_per_species == {'Herbivore': 3, 'Carnivore': 0}
+    assert len(statistics.histograms['Herbivore']['weight'].counts) == 10
+    assert statistics.cells[(1, 1)]['Herbivore'] == (2, 15.0, 25.0)
+
+    statistics.reset()
+    assert statistics.num_animals_per_species == {'Herbivore': 0, 'Carnivore': 0}
+    assert statistics.cells == {}
+
+
+def test_count_grids():
+    statistics = PopulationStatistics(shape=(3, 4))
+    statistics.add('Herbivore', np.array([1, 2]), np.array([10.0, 20.0]), np.array([0.5, 0.6]), (2, 3))
+    other = PopulationStatistics(shape=(3, 4))
+    other.add('Carnivore', np.array([3]), np.array([30.0]), np.array([0.7]), (4, 1))
+    statistics.merge(other)
+    assert statistics.grids['Herbivore'][2, 1] == 2
+    assert statistics.grids['Carnivore'][0, 3] == 1
+    assert statistics.grids['Herbivore'].sum() + statistics.grids['Carnivore'].sum() == 3
+
+    statistics.reset()
+    assert not statistics.grids['Herbivore'].any()
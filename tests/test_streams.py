@@ -0,0 +1,29 @@
+import numpy as np
+from src.biosim.streams import *
+
+
+def test_one_stream_per_phase():
+    streams = spawn_streams(1, 2, 3)
+    assert set(streams) == set(phases)
+    draws = [streams[phase].random() for phase in phases]
+    assert len(set(draws)) == len(phases)
+
+
+def test_streams_reproducible():
+    assert spawn_streams(7, 2, 3)['aging'].random() == spawn_streams(7, 2, 3)['aging'].random()
+
+
+def test_streams_independent_of_key_and_seed():
+    draw = spawn_streams(7, 2, 3)['aging'].random()
+    assert spawn_streams(7, 3, 2)['aging'].random() != draw
+    assert spawn_streams(8, 2, 3)['aging'].random() != draw
+
+
+def test_pack_and_unpack_streams():
+    streams = spawn_streams(7, 2, 3)
+    streams['migration'].integers(2 ** 32, dtype='uint32')
+    flat = []
+    assert pack_streams(streams, flat) is flat
+    assert flat == [value for row in pack_streams(streams) for value in row]
+    restored = restore_streams(np.array(flat, dtype=np.uint64).reshape(len(phases), 6))
+    assert [restored[phase].random() for phase in phases] == [streams[phase].random() for phase in phases]
@@ -0,0 +1,93 @@
+import numpy as np
+import pytest
+from src.biosim.land import Island
+from src.biosim.vectorized import *
+
+
+@pytest.fixture
+def land_map():
+    return {(1, 1): 'L', (1, 2): 'D', (2, 1): 'H', (2, 2): 'L'}
+
+
+@pytest.fixture
+def ini_pop():
+    return [{'loc': (1, 1), 'pop': [{'species': 'Herbivore', 'age': age, 'weight': 20} for age in range(10)]},
+            {'loc': (2, 1), 'pop': [{'species': 'Herbivore', 'age': 5, 'weight': 20} for _ in range(10)]},
+            {'loc': (2, 2), 'pop': [{'species': 'Carnivore', 'age': 5, 'weight': 20} for _ in range(3)]}]
+
+
+def test_insert_pop(land_map, ini_pop):
+    island = VectorizedIsland(land_map)
+    island.insert_pop(ini_pop)
+    herb_counts = island.herb_pop.counts(len(island))
+    assert herb_counts[island.cell_idx[(1, 1)]] == 10
+    assert herb_counts[island.cell_idx[(2, 1)]] == 10
+    assert island.num_animals_per_species == {'Herbivore': 20, 'Carnivore': 3}
+
+
+def test_grazing_matches_land(land_map, ini_pop):
+    serial = Island(land_map)
+    serial.insert_pop(ini_pop)
+    for cell in serial.cells:
+        cell.feeding()
+    vectorized = VectorizedIsland(land_map)
+    vectorized.insert_pop(ini_pop)
+    vectorized.feeding()
+
+    for cell in serial.cells:
+        idx = vectorized.cell_idx[cell.coord]
+        assert vectorized.grass[idx] == cell.grass
+        weight = vectorized.herb_pop.weight[vectorized.herb_pop.cell == idx]
+        assert sorted(weight) == sorted(cell.herb_pop.weight)
+
+
+def test_hunting_eats_weakest(monkeypatch):
+    # A tiny DeltaPhiMax makes every herbivore weaker than the carnivore a certain kill.
+    monkeypatch.setitem(Carnivore.params, 'DeltaPhiMax', 1e-9)
+    island = VectorizedIsland({(1, 1): 'D'})
+    island.herb_pop.append([1, 50, 50], [20, 30, 30], cell=0)
+    island.carn_pop.append(5, 20, cell=0)
+    island.feeding()
+    # The carnivore eats the two weakest herbivores to satisfy its appetite F = 50.
+    assert len(island.herb_pop) == 1
+    assert island.herb_pop.age[0] == 1
+    assert island.carn_pop.weight[0] == pytest.approx(20 + 0.75 * 50)
+
+
+def test_statistically_equivalent_to_serial():
+    ini_pop = [{'loc': (1, 1), 'pop': [{'species': 'Herbivore', 'age': 5, 'weight': 20} for _ in range(50)]}]
+    serial_counts = []
+    vectorized_counts = []
+    for seed in range(3):
+        serial = Island({(1, 1): 'L'}, seed=seed)
+        vectorized = VectorizedIsland({(1, 1): 'L'}, seed=seed)
+        serial.insert_pop(ini_pop)
+        vectorized.insert_pop(ini_pop)
+        for year in range(40):
+            serial.annual_cycle()
+            vectorized.annual_cycle()
+            if year >= 20:
+                serial_counts.append(serial.num_animals_per_species['Herbivore'])
+                vectorized_counts.append(vectorized.num_animals_per_species['Herbivore'])
+    assert np.mean(vectorized_counts) == pytest.approx(np.mean(serial_counts), rel=0.25)
+
+
+def test_migration_moves_to_neighbours(land_map, ini_pop):
+    island = VectorizedIsland(land_map)
+    island.insert_pop(ini_pop)
+    before = island.herb_pop.cell.copy()
+    island.migration()
+    assert island.num_animals_per_species == {'Herbivore': 20, 'Carnivore': 3}
+    for source, target in zip(before, island.herb_pop.cell):
+        assert target == source or target in island.neighbour_table[source]
+
+
+def test_results_independent_of_insertion_order(land_map, ini_pop):
+    forward = VectorizedIsland(land_map, seed=4)
+    backward = VectorizedIsland(land_map, seed=4)
+    forward.insert_pop(ini_pop)
+    backward.insert_pop(ini_pop[::-1])
+    for _ in range(5):
+        forward.annual_cycle()
+        backward.annual_cycle()
+    assert forward.cell_counts() == backward.cell_counts()
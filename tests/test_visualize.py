@@ -0,0 +1,77 @@
+import os
+import numpy as np
+import pytest
+from src.biosim.biosim import BioSim
+from src.biosim.statistics import PopulationStatistics
+from src.biosim.visualize import FrameRenderer, Visualize
+
+geography = "WWWW\nWLHW\nWWWW"
+
+
+def test_figure_built_once(tmp_path):
+    """The artists of the first update are reused for all later updates."""
+    vis = Visualize(geography, img_dir=str(tmp_path), img_base='test')
+    vis.setup(2)
+    statistics = PopulationStatistics(shape=(3, 4))
+    statistics.add('Herbivore', np.array([1, 2]), np.array([10.0, 20.0]), np.array([0.5, 0.6]), (2, 2))
+    statistics.add('Carnivore', np.array([3]), np.array([30.0]), np.array([0.7]), (2, 2))
+    vis.update(1, statistics)
+    vis.save()
+    artists = (vis._fig, vis._heatmaps['Herbivore'], vis._lines['Carnivore'], vis._stairs['Herbivore', 'age'])
+    vis.update(2, statistics)
+    vis.save()
+
+    assert artists == (vis._fig, vis._heatmaps['Herbivore'], vis._lines['Carnivore'], vis._stairs['Herbivore', 'age'])
+    assert vis._lines['Herbivore'].get_ydata().tolist() == [2, 2]
+    assert vis._heatmaps['Herbivore'].get_array()[1, 1] == 2
+    assert sorted(os.listdir(tmp_path)) == ['test_00000.png', 'test_00001.png']
+
+
+def test_simulate_writes_images(tmp_path):
+    ini_pop = [{'loc': (2, 2), 'pop': [{'species': 'Herbivore', 'age': 5, 'weight': 20} for _ in range(10)]}]
+    sim = BioSim(geography, ini_pop=ini_pop, vis_years=1, img_years=2, img_dir=str(tmp_path), img_base='sim',
+                 quiet=True)
+    sim.simulate(4)
+    assert sorted(os.listdir(tmp_path)) == ['sim_00000.png', 'sim_00001.png']
+    assert sim.visualize._no_of_years == 4
+
+
+@pytest.mark.parametrize("render_workers", [0, 2])
+def test_render_workers(tmp_path, render_workers):
+    """Figures are the same whether they are saved by the simulation or by worker processes."""
+    ini_pop = [{'loc': (2, 2), 'pop': [{'species': 'Herbivore', 'age': 5, 'weight': 20} for _ in range(10)]}]
+    sim = BioSim(geography, ini_pop=ini_pop, img_dir=str(tmp_path), img_base='sim', quiet=True,
+                 render_workers=render_workers)
+    sim.simulate(3)
+    sim.simulate(2)
+    assert sorted(os.listdir(tmp_path)) == ['sim_{:05d}.png'.format(num) for num in range(5)]
+
+
+def test_frame_renderer_queue_is_bounded(tmp_path):
+    vis = Visualize(geography, img_dir=str(tmp_path))
+    renderer = FrameRenderer(vis, workers=1, queue_size=1)
+    statistics = PopulationStatistics(shape=(3, 4))
+    for year in range(1, 4):
+        renderer.submit(vis.record(year, statistics))
+        assert renderer.queue.qsize() <= 1
+    renderer.close()
+    assert len(os.listdir(tmp_path)) == 3
+
+
+def test_render_failure_reaches_caller(tmp_path):
+    blocker = tmp_path / 'file'
+    blocker.write_text('')
+    ini_pop = [{'loc': (2, 2), 'pop': [{'species': 'Herbivore', 'age': 5, 'weight': 20} for _ in range(10)]}]
+    sim = BioSim(geography, ini_pop=ini_pop, img_dir=str(blocker / 'images'), quiet=True, render_workers=1)
+    with pytest.raises(RuntimeError):
+        sim.simulate(3)
+
+
+def test_close_with_stopped_worker_and_full_queue(tmp_path):
+    vis = Visualize(geography, img_dir=str(tmp_path))
+    renderer = FrameRenderer(vis, workers=1, queue_size=1)
+    renderer.processes[0].terminate()
+    renderer.processes[0].join()
+    renderer.queue.put((0, vis.record(1, PopulationStatistics(shape=(3, 4)))))
+    with pytest.raises(RuntimeError):
+        renderer.close()